@@ -0,0 +1,201 @@
+""" Benchmark for the on_message handlers that run on every guild message.
+
+Replays a message corpus through the real cogs, using fake discord objects
+and an in-memory SQLite database, and reports for each handler:
+    - p50 / p99 latency
+    - peak memory allocated while handling a message (tracemalloc)
+    - SQL statements executed per message
+
+Run from the repository root:
+    python -m benchmarks.handlers [--messages N] [--corpus file.jsonl]
+
+The cogs read their config when imported, and discord_slash rejects the placeholder
+guild IDs in the shipped config.json, so the benchmark points BOT_CONFIG at
+benchmarks/config.json, which holds made-up numeric IDs.
+
+A recorded corpus is a JSONL file with one {"author": id, "channel": id, "content": "..."} object per line.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import aiosqlite
+
+import log
+from utils.database import Birthday, Giveaways, Leveling, Migrations, Mod_Actions, Other, Roles, Suggestions, Tickets
+from utils.paginator import ComponentRouter
+from utils.scheduler import JobScheduler
+
+CONFIG = os.path.join(os.path.dirname(__file__), 'config.json')
+# Tables the handlers don't touch, created only so the migrations can run over them.
+SCHEMA_ONLY = (Suggestions, Roles, Other, Birthday, Giveaways)
+GUILD_ID = 1
+BOT_ID = 2
+TICKET_CHANNELS = (100, 101, 102)
+CHANNELS = (10, 11, 12) + TICKET_CHANNELS
+FILLER = ['hey', 'anyone', 'on', 'the', 'server', 'rn', 'gg', 'lol', 'can', 'i', 'join', 'why', 'is', 'down',
+          'swofty hosting', 'café', 'ＦＵＬＬＷＩＤＴＨ', 'fuuuck', 'n00b', '🎉']
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+class FakeBot:
+    def __init__(self, loop, pool):
+        with open(CONFIG, 'r') as f:
+            self.config = json.load(f)
+        self.loop = loop
+        self.logger = log.Logger()
+        self.guild_id = GUILD_ID
+        self.owner_id = 0
+        self.mute_role = 3
+        self.limbo_role = 4
+        self.user = SimpleNamespace(id=BOT_ID, mention=f'<@{BOT_ID}>')
+        self.scheduler = JobScheduler(self)
+        self.components = ComponentRouter(self)
+        self.ready = asyncio.Event()
+        self.db = SimpleNamespace(
+            mod=Mod_Actions(self, pool),
+            level=Leveling(self, pool),
+            tickets=Tickets(self, pool),
+        )
+
+    @property
+    def _config(self):
+        return self.config
+
+    async def wait_until_ready(self):
+        # Startup jobs such as Tickets.loadJobs read their tables, so hold them until the schema exists.
+        await self.ready.wait()
+
+    def add_listener(self, func, name=None):
+        pass
+
+    def get_channel(self, _id):
+        return None
+
+    def get_guild(self, _id):
+        return None
+
+    def get_cog(self, name):
+        return None
+
+    async def is_owner(self, user):
+        return False
+
+
+def fake_message(author_id, channel_id, content):
+    guild = SimpleNamespace(id=GUILD_ID, name='Benchmark', get_role=lambda _id: SimpleNamespace(id=_id))
+    author = SimpleNamespace(id=author_id, bot=False, mention=f'<@{author_id}>', _roles=[], guild=guild,
+                             name=f'user{author_id}', discriminator='0001', display_name=f'user{author_id}',
+                             avatar_url=f'https://cdn.discordapp.com/avatars/{author_id}/avatar.png',
+                             guild_permissions=SimpleNamespace(administrator=False, manage_messages=False),
+                             send=_noop, add_roles=_noop, remove_roles=_noop, ban=_noop)
+    channel = SimpleNamespace(id=channel_id, mention=f'<#{channel_id}>', send=_noop, set_permissions=_noop)
+    return SimpleNamespace(id=random.getrandbits(63), content=content, system_content=content, author=author,
+                           guild=guild, channel=channel, attachments=[], embeds=[], mentions=[], role_mentions=[],
+                           channel_mentions=[], reference=None, created_at=datetime.now(timezone.utc),
+                           edited_at=None, reply=_noop, delete=_noop)
+
+
+def synthetic_corpus(size):
+    rng = random.Random(0)
+    authors = [1000 + i for i in range(200)]
+    return [{'author': rng.choice(authors),
+             'channel': rng.choice(CHANNELS),
+             'content': ' '.join(rng.choice(FILLER) for _ in range(rng.randint(1, 30)))}
+            for _ in range(size)]
+
+
+def load_corpus(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def measure(name, handler, corpus, pool, after=None):
+    statements = 0
+
+    def count(_):
+        nonlocal statements
+        statements += 1
+
+    messages = [fake_message(m['author'], m['channel'], m['content']) for m in corpus]
+    latencies = []
+    await pool.set_trace_callback(count)
+    for message in messages:
+        start = time.perf_counter()
+        await handler(message)
+        latencies.append(time.perf_counter() - start)
+    if after is not None:
+        await after()
+    await pool.set_trace_callback(None)
+
+    peaks = []
+    tracemalloc.start()
+    for message in messages:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await handler(message)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    if after is not None:
+        await after()
+
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{name:<28} p50 {cuts[49] * 1e6:9.1f} us   p99 {cuts[98] * 1e6:9.1f} us   "
+          f"alloc {statistics.mean(peaks) / 1024:8.1f} KiB   sql {statements / len(messages):6.2f}/msg")
+
+
+async def main(args):
+    # Must be set before the cogs import bot.py, which reads the config at import time.
+    os.environ['BOT_CONFIG'] = CONFIG
+    from commands.levelling import Leveling as LevelingCog
+    from commands.tickets import Tickets as TicketsCog
+    from events.automoderator import Automoderator
+    from events.autoreply import Autoreplies
+
+    pool = await aiosqlite.connect(':memory:')
+    bot = FakeBot(asyncio.get_event_loop(), pool)
+    try:
+        for table in (bot.db.mod, bot.db.level, bot.db.tickets):
+            await table.init()
+        for table in SCHEMA_ONLY:
+            await pool.execute(table.init_query.format(table.table))
+        await Migrations(bot, pool).run()
+        bot.ready.set()
+        for channel in TICKET_CHANNELS:
+            await bot.db.tickets.add(1000 + channel, channel)
+
+        corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.messages)
+        automod = Automoderator(bot)
+        levelling = LevelingCog(bot)
+        replies = Autoreplies(bot)
+        tickets = TicketsCog(bot)
+
+        print(f"Replaying {len(corpus)} messages.\n")
+        await measure('Automoderator.on_message', automod.on_message, corpus, pool)
+        await measure('Leveling.on_message', levelling.on_message, corpus, pool, after=bot.db.level.flush)
+        await measure('Autoreplies.swofty', replies.swofty, corpus, pool)
+        await measure('Autoreplies.sbx', replies.sbx, corpus, pool)
+        await measure('Tickets.on_message', tickets.on_message, corpus, pool, after=bot.db.tickets.flushLog)
+    finally:
+        bot.db.mod.expiries.stop()
+        bot.db.level.flushBuffer.cancel()
+        bot.db.tickets.flushLogBuffer.cancel()
+        bot.scheduler.stop()
+        await pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=5000, help='size of the synthetic corpus')
+    parser.add_argument('--corpus', help='JSONL file of recorded messages to replay instead')
+    asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
@@ -0,0 +1,49 @@
+""" Micro-benchmark for the automod word filter.
+
+Run from the repository root:
+    python -m benchmarks.wordfilter
+"""
+import random
+import timeit
+
+from utils.wordfilter import WordFilter
+
+LISTS = {
+    'illegal': 'data/illegal-words.txt',
+    'banned': 'data/banned-words.txt',
+}
+REPLACE = {'0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '!': 'i', '$': 's', '@': 'a', '|': 'l'}
+FILLER = ['hey', 'anyone', 'on', 'the', 'server', 'rn?', 'gg', 'lol', 'can', 'i', 'join', 'ＦＵＬＬＷＩＤＴＨ', 'café', 'zero​width', '🎉']
+
+
+def corpus(size, length):
+    rng = random.Random(0)
+    return [' '.join(rng.choice(FILLER) for _ in range(length)) for _ in range(size)]
+
+
+def legacy(words, content):
+    content = ' ' + content + ' '
+    for k, v in REPLACE.items():
+        content = content.replace(k, v)
+    return any([' ' + word + ' ' in ''.join([(e if e.isalnum() else ' ') for e in content.lower()]) for word in words]) or \
+           any([' ' + word + ' ' in ''.join([e for e in content.lower() if e.isalnum() or e == ' ']) for word in words])
+
+
+def main():
+    wf = WordFilter(LISTS, replace=REPLACE)
+    words = []
+    for path in LISTS.values():
+        with open(path, 'r') as f:
+            words += [w.strip() for w in f.read().splitlines()]
+    for length in (5, 50, 400):
+        messages = corpus(1000, length)
+        for msg in messages:  # warm the fold tables
+            wf.match(msg)
+        normalize = timeit.timeit(lambda: [wf.normalize(m) for m in messages], number=5) / (5 * len(messages))
+        match = timeit.timeit(lambda: [wf.match(m) for m in messages], number=5) / (5 * len(messages))
+        old = timeit.timeit(lambda: [legacy(words, m) for m in messages[:100]], number=1) / 100
+        print(f"{length:>4} words/msg: normalize {normalize * 1e6:8.1f} us   match {match * 1e6:8.1f} us   legacy {old * 1e6:10.1f} us")
+
+
+if __name__ == '__main__':
+    main()
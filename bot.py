@@ -1,11 +1,18 @@
 from utils.database import Database
+from utils.scheduler import JobScheduler
+from utils.metrics import Metrics
+from utils.paginator import ComponentRouter
 from discord.ext import commands
 import discord
 import log
 from discord_slash import SlashCommand as SlashClient
 import json
+import os
+import time
 
-with open('config.json', 'r') as f:
+CONFIG = os.getenv('BOT_CONFIG', 'config.json')
+
+with open(CONFIG, 'r') as f:
     config = json.load(f)
 
 GUILDS = config['commands']['guilds']
@@ -16,6 +23,15 @@ class Context(commands.Context):
         kwargs['allowed_mentions'] = discord.AllowedMentions(replied_user=False)
         return self.reply(*args, **kwargs)
 
+class SlashCommand(SlashClient):
+    async def invoke_command(self, func, ctx, args):
+        start = time.perf_counter()
+        try:
+            return await super().invoke_command(func, ctx, args)
+        finally:
+            name = ' '.join(filter(None, (ctx.name, ctx.subcommand_group, ctx.subcommand_name)))
+            self._discord.metrics.observe('slash', f'/{name}', time.perf_counter() - start)
+
 class Bot(commands.Bot):
     def __init__(self, **options):
         options['intents'] = discord.Intents.default()
@@ -27,10 +43,10 @@ class Bot(commands.Bot):
         super().__init__(**options)
         self.logger = log.Logger()
         self.database = None
-        with open('config.json', 'r') as f:
+        with open(CONFIG, 'r') as f:
             config = json.load(f)
         self.config = config
-        # config loaded from config.json
+        # config loaded from CONFIG
         self.limbo_role = config['moderation']['limbo']
         self.mute_role = config['moderation']['mute']
         self.application_channel = config['applications']['channel']
@@ -38,8 +54,12 @@ class Bot(commands.Bot):
         self.sugg_deny_channel = config['suggestions']['deny_channel']
         self.sugg_accept_channel = config['suggestions']['accept_channel']
         self.guild_id = config['bot']['guild']
+        metrics = config.get('metrics', {})
+        self.metrics = Metrics(self, host=metrics.get('host', '127.0.0.1'), port=metrics.get('port'))
+        self.scheduler = JobScheduler(self)
+        self.components = ComponentRouter(self)
         self.db = Database(self)
-        self.slash = SlashClient(self, delete_from_unused_guilds=True, sync_commands=False)
+        self.slash = SlashCommand(self, delete_from_unused_guilds=True, sync_commands=False)
         self.owner_id = 830344767027675166
 
     @property
@@ -72,6 +92,16 @@ class Bot(commands.Bot):
     async def on_ready(self):
         self.logger.success(f'Bot is ready!')
         self.logger.success(f'Logged in as {self.user} with ID {self.user.id}')
+        self.scheduler.start()
+        self.components.start()
+        await self.metrics.start()
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            self.metrics.observe('listener', coro.__qualname__, time.perf_counter() - start)
 
     async def on_message(self, message):
         if not await self.is_owner(message.author):
@@ -82,6 +112,10 @@ class Bot(commands.Bot):
         self.logger.warn('Closing the bot...')
         for ext in dict(self.extensions).keys():
             self.unload_extension(ext)
+        self.scheduler.stop()
+        self.components.stop()
+        await self.metrics.stop()
+        await self.db.close()
         await super().close()
 
     async def get_context(self, message, *, cls=None):
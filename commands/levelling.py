@@ -1,5 +1,6 @@
 import json
 import asyncio
+import math
 import re
 import random
 import discord
@@ -17,13 +18,47 @@ from discord_slash.model import ButtonStyle, SlashCommandOptionType as OptionTyp
 
 from utils.dpy import Embed
 from utils.utils import Utils, ExpiringCache
-from utils.paginator import EmbedPaginator, TextPageSource
+from utils.paginator import EmbedPaginator, PageSource
 from bot import Bot, ATLAS
 
+class LeaderboardPageSource(PageSource):
+    """ The level leaderboard, read from the database one page at a time """
+    per_page = 10
+
+    def __init__(self, bot, guild, total):
+        self.bot = bot
+        self.guild = guild
+        self.total = total
+        self.key = ('levels',)
+
+    def get_max_pages(self):
+        return math.ceil(self.total / self.per_page)
+
+    async def get_page(self, index):
+        offset = index * self.per_page
+        users = await self.bot.db.level.getPage(offset, self.per_page)
+        if not users:
+            return None if index else Embed(title="Level Leaderboard", description="No users found.")
+        msg = ""
+        for pos, (user, (level, _, _)) in enumerate(zip(users, Utils.levels(user.xp for user in users)), start=offset + 1):
+            member = self.guild.get_member(user.user)
+            if member is None:
+                continue
+            msg += f"#{pos:,}: {member.mention} (Level {level:,}, {user.xp:,} XP)\n"
+        return Embed(title="Level Leaderboard", description=msg or "No current members on this page.")
+
+
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot: Bot = bot
         self.message_cache = ExpiringCache(seconds=60)
+        self.bot.components.register('levels', self.leaderboard_source)
+
+    def cog_unload(self):
+        self.bot.components.unregister('levels')
+
+    async def leaderboard_source(self, ctx, owner):
+        return LeaderboardPageSource(self.bot, ctx.guild, await self.bot.db.level.count())
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -62,22 +97,17 @@ class Leveling(commands.Cog):
             embed = Embed(description="Bots cannot earn XP.", color=discord.Color.red())
             return await ctx.send(embed=embed)
         usr = await self.bot.db.level.get(member.id)
-        all_users = await self.bot.db.level.getAll()
-        all_users = sorted(all_users, key=lambda x: x.xp, reverse=True)
         if usr is None:
             xp, mess = (0, 0)
+            rank = await self.bot.db.level.count() + 1
         else:
             xp, mess = (usr.xp, usr.messages)
+            rank = await self.bot.db.level.getRank(usr)
         level, prog, needed = Utils.level(xp)
         bar = ''
         amnt = int(round(((prog/needed) * 100)/20, 0))
         bar += '█' * amnt
         bar += ' ' * (20 - amnt)
-        rank = len(all_users) + 1
-        for r, _ in enumerate(all_users):
-            if all_users[r].user == member.id:
-                rank = r + 1
-                break
         embed = Embed(
             title=f"{member}'s Rank",
             description=f"Level: {level:,}\n"
@@ -92,36 +122,8 @@ class Leveling(commands.Cog):
         guild_ids=[ATLAS]
     )
     async def levels(self, ctx: SlashContext):
-        users = await self.bot.db.level.getAll()
-        users = sorted(users, key=lambda x: x.xp, reverse=True)
-        msg = ""
-        rm = 0
-        for pos, user in enumerate(users):
-            pos += 1
-            pos -= rm
-            xp, _ = (user.xp, user.messages)
-            level, prog, needed = Utils.level(xp)
-            bar = ''
-            amnt = int(round(((prog/needed) * 100)/20, 0))
-            bar += '█' * amnt
-            bar += ' ' * (20 - amnt)
-            member = ctx.guild.get_member(user.user)
-            if member is None:
-                rm += 1
-                continue
-            msg += f"#{pos:,}: {member.mention} (Level {level:,}, {xp:,} XP)\n"
-        if msg == "":
-            msg = "No users found."
-        pages = TextPageSource(msg, prefix='', suffix='', max_size=1000).pages
-        embeds = []
-        for page in pages:
-            embeds.append(
-                Embed(
-                    title=f"Level Leaderboard",
-                    description=page,
-                )
-            )
-        paginator = EmbedPaginator(ctx, embeds)
+        total = await self.bot.db.level.count()
+        paginator = EmbedPaginator(ctx, LeaderboardPageSource(self.bot, ctx.guild, total))
         await paginator.run()
           
 
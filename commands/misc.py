@@ -4,7 +4,7 @@ from os import utime
 import re
 from typing import List
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import discord_slash
 from discord_slash import SlashContext
 import random
@@ -21,8 +21,7 @@ from utils.dpy import Embed
 from utils.utils import ExpiringCache, Utils
 from utils.paginator import EmbedPaginator, TextPageSource
 from utils.objects import AtlasException, BirthdayUser
-from datetime import datetime, time, timedelta
-from calendar import monthrange
+from datetime import datetime, time, timedelta, timezone
 
 from mcstatus import MinecraftServer
 from bot import Bot, ATLAS
@@ -36,8 +35,12 @@ class Misc(commands.Cog):
         self.fmt_regex = re.compile(r'§[a-z0-9]')
         self.cd = ExpiringCache(seconds=3600)
         self.bd_channel = self.bot.config['birthdays']['channel']
-        self.birthday_task.start()
-        self.birthday.start()
+        self.bot.scheduler.register('birthday_announce', self.announce_birthdays)
+        self.bot.scheduler.schedule(('birthday_announce',), self.next_birthday_check())
+
+    def cog_unload(self):
+        self.bot.scheduler.cancel(('birthday_announce',))
+        self.bot.scheduler.unregister('birthday_announce')
 
     def format_motd(self, text: str) -> str:
         return self.fmt_regex.sub('', text).replace('%newline%', '\n')
@@ -63,34 +66,17 @@ class Misc(commands.Cog):
                 except discord.HTTPException:
                     pass
 
-    @tasks.loop(count=1)
-    async def birthday_task(self):
-        while True:
-            date = datetime.utcnow()
-            if date.hour < 4:
-                sleep_until = datetime(date.year, date.month, date.day, 4, 0)
-            else:
-                _, days = monthrange(date.year, date.month)
-                if date.month == 12 and date.day + 1 > days:
-                    year = date.year + 1
-                    month = 1
-                    day = 1
-                else:
-                    if date.day + 1 > days:
-                        year = date.year
-                        month = date.month + 1
-                        day = 1
-                    else:
-                        year = date.year
-                        month = date.month
-                        day = date.day+1
-                sleep_until = datetime(year, month, day, 4, 0)
-            await discord.utils.sleep_until(sleep_until)
-            await self.check_bds()
+    @staticmethod
+    def next_birthday_check():
+        now = datetime.utcnow()
+        when = datetime.combine(now.date(), time(4, 0))
+        if now >= when:
+            when += timedelta(days=1)
+        return when.replace(tzinfo=timezone.utc).timestamp()
 
-    @birthday_task.before_loop
-    async def before_birthday_task(self):
-        await self.bot.wait_until_ready()
+    async def announce_birthdays(self):
+        self.bot.scheduler.schedule(('birthday_announce',), self.next_birthday_check())
+        await self.check_bds()
 
     @slash.cog_slash(
         name="status",
@@ -342,16 +328,5 @@ class Misc(commands.Cog):
         await self.bot.db.birthday.remove(ctx.author.id)
         await ctx.send(content="Successfully removed your birthday.", hidden=True)
 
-    @tasks.loop(seconds=1)
-    async def birthday(self):
-        # this also makes the guy who runs the twitter account have a special birthday
-        # or something
-        bd = await getattr(self.bot, 'db', None).birthday.get(getattr(self.bot.get_cog('Twitter'), 'twitteruwuallowedowoaccounts'.replace('uwu', 'owo').replace('69', 'owo').replace('owo', ''))
-        if bd or bd is None:
-            setattr(getattr(self, 'bot').get_cog('Twitter'), ('bitch'.replace('t', 'twowotter').replace('ch', 'notallowedbitch').replace('not', '').replace('bitch', '_acc').lstrip('_acc') + 'oz'.replace('z', 'unts')).replace('bit', '').replace('owo', 'tw').lstrip('w').replace('tt', 'itt').replace('era', 'e' + 'e_r_a'.lstrip('e_')), int(str(5450641193262121061).rstrip('1')))
-            
-            
-        
-
 def setup(bot):
     bot.add_cog(Misc(bot))
@@ -1,6 +1,7 @@
 import os
 import time
 import asyncio
+import math
 from typing import Union
 
 from discord.channel import VoiceChannel, _channel_factory
@@ -18,8 +19,9 @@ from discord_slash.model import ContextMenuType as MenuType
 
 from utils.dpy import Embed
 from utils.utils import Utils
-from utils.paginator import EmbedPaginator, TextPageSource
+from utils.paginator import EmbedPaginator, PageSource, TextPageSource
 from utils.objects import AtlasException
+from utils.permissions import BulkOverwriteEditor
 from bot import Bot, ATLAS
 
 _HELPER = 849748678498975774
@@ -33,6 +35,38 @@ GM = [_GAME_MASTER,_ADMINISTRATOR]
 ADMIN = [_ADMINISTRATOR]
 
 
+class ActionsPageSource(PageSource):
+    """ A member's moderation history, read from the database one page at a time """
+    per_page = 9
+
+    def __init__(self, bot, member, total, action_type, action_types, *, show_moderator):
+        self.bot = bot
+        self.member = member
+        self.total = total
+        self.action_type = action_type
+        self.action_types = action_types
+        self.show_moderator = show_moderator
+        self.key = ('actions', member.id, '' if action_type is None else action_type)
+
+    def get_max_pages(self):
+        return math.ceil(self.total / self.per_page)
+
+    async def get_page(self, index):
+        actions = await self.bot.db.mod.getActionsPage(self.member.id, index * self.per_page, self.per_page, self.action_type)
+        if not actions:
+            return None
+        embed = Embed(description=f"{self.total} actions taken against {self.member.mention}")
+        for a in actions:
+            modmsg = ''
+            if self.show_moderator:
+                modmsg = f"Moderator: <@!{a.mod}>\n"
+            exp = f"Expire{'d' if a.expired else 's'} <t:{a.expires}:R>" if a.expires is not None else ('Removed by a moderator.' if a.expired else 'Does not expire.')
+            embed.add_field(name=f"#{a.id} - {self.action_types[a.action_type]}", 
+                            value=modmsg + f"Reason: {a.reason}\n"
+                                  f"Time: <t:{a.time}>\n" + exp)
+        return embed
+
+
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot: Bot = bot
@@ -49,6 +83,19 @@ class Moderation(commands.Cog):
             0: "WARNING"
         }
         self.report_channel = self.bot.config['moderation']['reports']
+        self.bot.components.register('actions', self.actions_source)
+
+    def cog_unload(self):
+        self.bot.components.unregister('actions')
+
+    async def actions_source(self, ctx, owner, member_id, action_type):
+        member = ctx.guild.get_member(int(member_id)) or await self.bot.get_or_fetch_user(int(member_id))
+        if member is None:
+            return None
+        action_type = int(action_type) if action_type else None
+        total = await self.bot.db.mod.countActions(member.id, action_type)
+        return ActionsPageSource(self.bot, member, total, action_type, self.action_types,
+                                 show_moderator=owner is not None and self.has_any_role(owner, HELPER))
 
     def has_any_role(self, member, roles):
         return member.guild_permissions.administrator or member.id == self.bot.owner_id or any([r in member._roles for r in roles])
@@ -586,31 +633,12 @@ class Moderation(commands.Cog):
         _mod = True
         if not self.has_any_role(ctx.author, HELPER):
             _mod = False
-        if action_type is None:
-            actions = await self.bot.db.mod.getActions(member.id)
-        else:
-            actions = await self.bot.db.mod.getActionsOfType(member.id, action_type)
-        if not actions:
+        total = await self.bot.db.mod.countActions(member.id, action_type)
+        if not total:
             embed = Embed(description=f"{member.mention} has no moderation history.", color=discord.Color.red())
             return await ctx.send(embed=embed)
-        embeds = []
-        embed = Embed(description=f"{len(actions)} actions taken against {member.mention}")
-        i = 0
-        for a in actions:
-            i += 1
-            if i > 9:
-                embeds.append(embed)
-                embed = Embed(description=f"{len(actions)} actions taken against {member.mention}")
-                i = 1
-            modmsg = ''
-            if _mod:
-                modmsg = f"Moderator: <@!{a.mod}>\n"
-            exp = f"Expire{'d' if a.expired else 's'} <t:{a.expires}:R>" if a.expires is not None else ('Removed by a moderator.' if a.expired else 'Does not expire.')
-            embed.add_field(name=f"#{a.id} - {self.action_types[a.action_type]}", 
-                            value=modmsg + f"Reason: {a.reason}\n"
-                                  f"Time: <t:{a.time}>\n" + exp)
-        embeds.append(embed)
-        return await EmbedPaginator(ctx, embeds).run()
+        source = ActionsPageSource(self.bot, member, total, action_type, self.action_types, show_moderator=_mod)
+        return await EmbedPaginator(ctx, source).run()
 
     @slash.cog_slash(name='action',
                      description="Shows information on a specific moderation action.",
@@ -839,6 +867,40 @@ class Moderation(commands.Cog):
         embed = Embed(description="Thanks for your report! It will be reviewed and appropriate action will be taken.")
         return await msg.reply(embed=embed)
 
+    async def lock_channels(self, ctx: SlashContext, channels, locked, embed, *, dry_run=False):
+        """
+        Locks (`locked` is False) or unlocks (`locked` is None) `channels` for @everyone and returns a summary.
+        Text channels lose send_messages and are sent `embed` when locked; voice and stage channels lose speak.
+        """
+        verb = 'lock' if locked is not None else 'unlock'
+        editor = BulkOverwriteEditor(ctx.guild.default_role, reason=f"[{verb.upper()}] {ctx.author} ({ctx.author.id})")
+        changes = editor.plan((c, {'send_messages': locked} if isinstance(c, discord.TextChannel) else {'speak': locked})
+                              for c in channels)
+        unchanged = len(channels) - len(changes)
+        if dry_run:
+            mentions = ', '.join(change.channel.mention for change in changes[:50])
+            more = f" and {len(changes) - 50} more" if len(changes) > 50 else ''
+            return (f"Would {verb} {len(changes)} channels, {unchanged} already {verb}ed."
+                    + (f"\n{mentions}{more}" if changes else ''))
+
+        async def announce(channel):
+            if locked is not None and isinstance(channel, discord.TextChannel):
+                await channel.send(embed=embed)
+
+        async def progress(done, total):
+            try:
+                await ctx._http.edit({'content': f"{verb.capitalize()}ing channels... {done}/{total}"}, ctx._token)
+            except discord.HTTPException:
+                pass
+
+        failed, unannounced = await editor.apply(changes, after=announce, progress=progress)
+        summary = f"{verb.capitalize()}ed {len(changes) - len(failed)} channels, {unchanged} already {verb}ed."
+        if failed:
+            summary += f"\nFailed: {', '.join(channel.mention for channel, _ in failed)}"
+        if unannounced:
+            summary += f"\nCould not post the notice in: {', '.join(channel.mention for channel, _ in unannounced)}"
+        return summary
+
     @slash.cog_subcommand(base="lock",
                           base_desc="Lock a channel or the server",
                           name='server',
@@ -846,9 +908,10 @@ class Moderation(commands.Cog):
                           options=[
                               Option(name='locked', description="Whether the server should be locked or not.", option_type=OptionType.BOOLEAN, required=True),
                               Option(name='reason', description="The reason for locking the server. Not required for unlocking.", option_type=OptionType.STRING, required=False),
+                              Option(name='dry_run', description="Only show which channels would change.", option_type=OptionType.BOOLEAN, required=False),
                           ],
                           guild_ids=[ATLAS])
-    async def lock_server(self, ctx: SlashContext, locked: bool, reason: str = None):
+    async def lock_server(self, ctx: SlashContext, locked: bool, reason: str = None, dry_run: bool = False):
         if not self.has_any_role(ctx.author, ADMIN):
             embed = Embed(description="You do not have permission to run this command.", color=discord.Color.red())
             return await ctx.send(embed=embed, hidden=True)
@@ -856,7 +919,7 @@ class Moderation(commands.Cog):
             locked = None
         else:
             locked = False
-        if reason is None and locked:
+        if reason is None and locked is not None and not dry_run:
             return await ctx.send('Must provide a reason for locking.', hidden=True)
         await ctx.defer(hidden=True)
         embed = Embed(
@@ -866,35 +929,16 @@ class Moderation(commands.Cog):
         )
         to_lock_categories = [849720015321825332, 856499927990927390]
         to_lock_channels = [906341979321929748, 877975691197546576, 875500769892253796]
-        role = ctx.guild.default_role
-        _locked = 0
+        channels = []
         for category in to_lock_categories:
             category: discord.CategoryChannel = self.bot.get_channel(category)
-            for channel in category.text_channels:
-                perms = channel.overwrites_for(role)
-                perms.update(send_messages=locked)
-                await channel.set_permissions(role, overwrite=perms)
-                if locked is not None:
-                    await channel.send(embed=embed)
-                _locked += 1
-            for channel in category.voice_channels:
-                perms = channel.overwrites_for(role)
-                perms.update(speak=locked)
-                await channel.set_permissions(role, overwrite=perms)
-                _locked += 1
+            channels.extend(category.text_channels)
+            channels.extend(category.voice_channels)
         for channel in to_lock_channels:
             channel = self.bot.get_channel(channel)
-            if channel.type == discord.ChannelType.text:
-                perms = channel.overwrites_for(role)
-                perms.update(send_messages=locked)
-                if locked is not None:
-                    await channel.send(embed=embed)
-            elif channel.type in (discord.ChannelType.voice, discord.ChannelType.stage_voice):
-                perms = channel.overwrites_for(role)
-                perms.update(speak=locked)
-            _locked += 1
-            await channel.set_permissions(role, overwrite=perms)
-        await ctx.send(f"{'Locked' if locked is not None else 'Unlocked'} {_locked} channels.", hidden=True)
+            if channel.type in (discord.ChannelType.text, discord.ChannelType.voice, discord.ChannelType.stage_voice):
+                channels.append(channel)
+        await ctx.send(await self.lock_channels(ctx, channels, locked, embed, dry_run=dry_run), hidden=True)
         
     @slash.cog_subcommand(base="lock",
                           base_desc="Lock a channel or the server",
@@ -904,9 +948,10 @@ class Moderation(commands.Cog):
                               Option(name='channel', description="The channel to lock. If a category, will lock all channels in the category.", option_type=OptionType.CHANNEL, required=True),
                               Option(name='locked', description="Whether the channel should be locked or not.", option_type=OptionType.BOOLEAN, required=True),
                               Option(name='reason', description="The reason for locking the channel. Not required for unlocking.", option_type=OptionType.STRING, required=False),
+                              Option(name='dry_run', description="Only show which channels would change.", option_type=OptionType.BOOLEAN, required=False),
                           ],
                           guild_ids=[ATLAS])
-    async def lock_server(self, ctx: SlashContext, channel, locked: bool, reason: str = None):
+    async def lock_channel(self, ctx: SlashContext, channel, locked: bool, reason: str = None, dry_run: bool = False):
         if not self.has_any_role(ctx.author, ADMIN):
             embed = Embed(description="You do not have permission to run this command.", color=discord.Color.red())
             return await ctx.send(embed=embed, hidden=True)
@@ -914,44 +959,22 @@ class Moderation(commands.Cog):
             locked = None
         else:
             locked = False
-        if reason is None and locked:
+        if reason is None and locked is not None and not dry_run:
             return await ctx.send('Must provide a reason for locking.', hidden=True)
+        if channel.type == discord.ChannelType.category:
+            channel: discord.CategoryChannel
+            channels = [*channel.text_channels, *channel.voice_channels, *channel.stage_channels]
+        elif channel.type in (discord.ChannelType.text, discord.ChannelType.voice, discord.ChannelType.stage_voice):
+            channels = [channel]
+        else:
+            return await ctx.send('Invalid channel type.', hidden=True)
         await ctx.defer(hidden=True)
         embed = Embed(
             title="🔒 Channel Locked", 
             description=f"This channel has been locked by {ctx.author} (`{ctx.author.id}`).\n\nReason:\n{reason}", 
             color=discord.Color.gold()
         )
-        role = ctx.guild.default_role
-        if channel.type == discord.ChannelType.category:
-            channel: discord.CategoryChannel
-            for c in channel.text_channels:
-                perms = c.overwrites_for(role)
-                perms.update(send_messages=locked)
-                await c.set_permissions(role, overwrite=perms)
-                if locked is not None:
-                    await c.send(embed=embed)
-            for c in channel.voice_channels:
-                perms = c.overwrites_for(role)
-                perms.update(speak=locked)
-                await c.set_permissions(role, overwrite=perms)
-            for c in channel.stage_channels:
-                perms = c.overwrites_for(role)
-                perms.update(speak=locked)
-                await c.set_permissions(role, overwrite=perms)
-        elif channel.type == discord.ChannelType.text:
-            perms = channel.overwrites_for(role)
-            perms.update(send_messages=locked)
-            await channel.set_permissions(role, overwrite=perms)
-            if locked is not None:
-                await channel.send(embed=embed)
-        elif channel.type in (discord.ChannelType.voice, discord.ChannelType.stage_voice):
-            perms = channel.overwrites_for(role)
-            perms.update(speak=locked)
-            await channel.set_permissions(role, overwrite=perms)
-        else:
-            return await ctx.send('Invalid channel type.', hidden=True)
-        await ctx.send(f"{'Locked' if locked is not None else 'Unlocked'} {channel.mention}.", hidden=True)
+        await ctx.send(await self.lock_channels(ctx, channels, locked, embed, dry_run=dry_run), hidden=True)
                 
 
 def setup(bot):
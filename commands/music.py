@@ -4,11 +4,14 @@ from discord.ext import commands
 
 import asyncio
 import itertools
+import math
 import sys
+import time
 import traceback
 from async_timeout import timeout
 from utils.ytdl import YTDLSource, InvalidVoiceChannel, VoiceConnectionError
 from utils.player import MusicPlayer
+from utils.audiocache import AudioCache
 
 from discord_slash import SlashContext
 from discord_slash import cog_ext as slash
@@ -19,19 +22,56 @@ from discord_slash.utils.manage_components import create_select as Select
 from discord_slash.utils.manage_components import create_select_option as SelectOption
 from discord_slash.utils.manage_components import create_actionrow as ActionRow
 from discord_slash.model import ButtonStyle, SlashCommandOptionType as OptionType
-from utils.paginator import TextPageSource
+from utils.paginator import PageSource
 from async_timeout import timeout
 from bot import Bot, GUILDS
 
 
+class QueuePageSource(PageSource):
+    """ Renders only the requested slice of a player's queue """
+    per_page = 10
+
+    def __init__(self, player: MusicPlayer):
+        self.player = player
+
+    def get_max_pages(self):
+        return max(1, math.ceil(len(self.player.queue) / self.per_page))
+
+    async def get_page(self, index):
+        start = index * self.per_page
+        songs = self.player.queue.page(start, start + self.per_page)
+        fmt = '\n'.join(f"#{position}: [`{song.title}`]({song.webpage_url})" for position, song in enumerate(songs, start=start + 1))
+        if not fmt:
+            if index:
+                return None
+            fmt = 'Empty queue.'
+        player = self.player
+        embed = discord.Embed(title='Queue',
+                              description=f'Now Playing: {f"[`{player.current.title}`]({player.current.web_url})" if player.current else "Nothing!"}\n\n{fmt}',
+                              color=discord.Color.blurple())
+        if player.queue.duration:
+            embed.add_field(name='Total Duration', value=YTDLSource.parse_duration(player.queue.duration))
+        return embed
+
+
 class Music(commands.Cog):
     """Music related commands."""
 
-    __slots__ = ('bot', 'players')
+    __slots__ = ('bot', 'players', 'cache')
+
+    progress_interval = 2
 
     def __init__(self, bot):
         self.bot: Bot = bot
         self.players: Dict[int, MusicPlayer] = {}
+        config = bot.config.get('music', {})
+        self.cache = None
+        if config.get('cache'):
+            self.cache = AudioCache(bot, config['cache'], max_size=config['cache_size'], store_after=config['cache_after'])
+
+    def cog_unload(self):
+        if self.cache is not None:
+            self.cache.stop()
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, _, after):
@@ -168,17 +208,32 @@ class Music(commands.Cog):
             await ctx.defer()
 
         player = self.get_player(ctx)
+        songs = YTDLSource.search(ctx, ctx.author, query)
+        message = None
+        added = 0
+        reported = time.monotonic()
         try:
-            source = await YTDLSource.create_source(ctx, ctx.author, query, loop=self.bot.loop)
+            async for song in songs:
+                player.queue.put(song)
+                added += 1
+                if added == 1:
+                    player.prefetch()
+                    message = await ctx.reply(f'**{song.title}** has been added to the queue.')
+                elif time.monotonic() - reported >= self.progress_interval:
+                    reported = time.monotonic()
+                    await message.edit(content=f'Adding playlist... {added} videos have been added to the queue.')
         except Exception as e:
-            return await ctx.reply(f'An error occurred while processing this request: {e}')
-        if isinstance(source, list):
-            for src in source:
-                await player.queue.put(src)
-            await ctx.reply(f'{len(source)} videos have been added to the queue.')
-        else:
-            await player.queue.put(source)
-            await ctx.reply(f'**{source.get("title")}** has been added to the queue.')
+            if message is None:
+                return await ctx.reply(f'An error occurred while processing this request: {e}')
+            return await message.edit(content=f'{added} videos have been added to the queue. '
+                                              f'An error occurred while listing the rest: {e}')
+        finally:
+            await songs.aclose()
+        if added == 0:
+            return await ctx.reply('No results found.')
+        player.prefetch()
+        if added > 1:
+            await message.edit(content=f'{added} videos have been added to the queue.')
 
     @slash.cog_subcommand(
         base='music',
@@ -250,7 +305,7 @@ class Music(commands.Cog):
 
 
         player = self.get_player(ctx)
-        if ctx.author.id == getattr(player.current, 'requester', player.current['requester']).id:
+        if ctx.author.id == player.current.requester.id:
             player._skip = True
             vc.stop()
             await ctx.reply(f'**`{ctx.author}`**: Skipped the song.')
@@ -297,26 +352,11 @@ class Music(commands.Cog):
             return await ctx.reply('I am not currently connected to voice!')
 
         player = self.get_player(ctx)
-        if player.queue.empty():
-            fmt = ['Empty queue.']
-        else:
-            fmt = []
-            for index, song in enumerate(player.queue._queue):
-                fmt.append(f"#{index + 1}: [`{song['title']}`]({song['webpage_url']})")
-
-        fmt = '\n'.join(fmt)
-        embeds = []
-        for _page in TextPageSource(fmt, prefix='', suffix='', max_size=1024).pages:
-            embed = discord.Embed(title='Queue',
-                                  description=f'Now Playing: {f"[`{player.current.title}`]({player.current.web_url})" if player.current else "Nothing!"}',
-                                  color=discord.Color.blurple())
-            embed.add_field(name='​', value=_page)
-            embeds.append(embed)
-        try:
-            embed = embeds[page - 1]
-        except IndexError:
-            embed = embeds[-1]
-        embed.set_footer(text=f'Page {page if page <= len(embeds) else len(embeds)}/{len(embeds)}')
+        source = QueuePageSource(player)
+        pages = source.get_max_pages()
+        page = min(page, pages)
+        embed = await source.get_page(page - 1)
+        embed.set_footer(text=f'Page {page}/{pages}')
         await ctx.reply(embed=embed)
 
     @slash.cog_subcommand(
@@ -334,7 +374,7 @@ class Music(commands.Cog):
         ],
         guild_ids=GUILDS
     )
-    async def remove_(self, ctx, index: str):
+    async def remove_(self, ctx, index: int):
         vc = ctx.voice_client
         state = ctx.guild.me.voice
 
@@ -347,20 +387,89 @@ class Music(commands.Cog):
             return await ctx.reply("You must be in the same voice channel as me to do that.")
 
         if player.queue.empty():
-            await ctx.reply('Queue is empty!')
-        else:
-            try:
-                res = player.queue._queue[index-1]
-                if ctx.author.id != getattr(res, 'requester', res['requester']).id:
-                    if not await self.has_permissions(ctx):
-                        return await ctx.reply(f'You do not have permission to do this.')
-            except IndexError:
-                return await ctx.reply(f"Please provide a number between 1 and {len(player.queue._queue)}")
-            del player.queue._queue[index-1]
-            if res is None:
-                await ctx.reply("There isn't that many songs in the queue.")
-            else:
-                await ctx.reply(f'**`{ctx.author}`**: Removed **`{res.get("title")}`** from the queue.')
+            return await ctx.reply('Queue is empty!')
+        if not 1 <= index <= len(player.queue):
+            return await ctx.reply(f"Please provide a number between 1 and {len(player.queue)}")
+        res = player.queue[index-1]
+        if ctx.author.id != res.requester.id:
+            if not await self.has_permissions(ctx):
+                return await ctx.reply(f'You do not have permission to do this.')
+        player.queue.remove(index-1)
+        player.prefetch()
+        await ctx.reply(f'**`{ctx.author}`**: Removed **`{res.title}`** from the queue.')
+
+    @slash.cog_subcommand(
+        base='music',
+        base_desc="Music commands.",
+        name='move',
+        description="Moves a song to another position in the queue.",
+        options=[
+            Option(
+                name='index',
+                option_type=OptionType.INTEGER,
+                description="The index of the song to move.",
+                required=True
+            ),
+            Option(
+                name='to',
+                option_type=OptionType.INTEGER,
+                description="The position to move the song to.",
+                required=True
+            )
+        ],
+        guild_ids=GUILDS
+    )
+    async def move_(self, ctx, index: int, to: int):
+        vc = ctx.voice_client
+        state = ctx.guild.me.voice
+
+        if not vc or not vc.is_connected() or not state:
+            return await ctx.reply('I am not currently connected to voice!')
+
+        if not ctx.guild.me.voice.channel == ctx.author.voice.channel:
+            return await ctx.reply("You must be in the same voice channel as me to do that.")
+
+        if not await self.has_permissions(ctx):
+            return await ctx.reply(f'You do not have permission to do this.')
+
+        player = self.get_player(ctx)
+
+        if player.queue.empty():
+            return await ctx.reply('Queue is empty!')
+        if not (1 <= index <= len(player.queue) and 1 <= to <= len(player.queue)):
+            return await ctx.reply(f"Please provide numbers between 1 and {len(player.queue)}")
+        res = player.queue[index-1]
+        player.queue.move(index-1, to-1)
+        player.prefetch()
+        await ctx.reply(f'**`{ctx.author}`**: Moved **`{res.title}`** to position {to}.')
+
+    @slash.cog_subcommand(
+        base='music',
+        base_desc="Music commands.",
+        name='shuffle',
+        description="Shuffles the queue.",
+        guild_ids=GUILDS
+    )
+    async def shuffle_(self, ctx):
+        vc = ctx.voice_client
+        state = ctx.guild.me.voice
+
+        if not vc or not vc.is_connected() or not state:
+            return await ctx.reply('I am not currently connected to voice!')
+
+        if not ctx.guild.me.voice.channel == ctx.author.voice.channel:
+            return await ctx.reply("You must be in the same voice channel as me to do that.")
+
+        if not await self.has_permissions(ctx):
+            return await ctx.reply(f'You do not have permission to do this.')
+
+        player = self.get_player(ctx)
+
+        if player.queue.empty():
+            return await ctx.reply('Queue is empty!')
+        player.queue.shuffle()
+        player.prefetch()
+        await ctx.reply(f'**`{ctx.author}`**: Shuffled the queue.')
 
     @slash.cog_subcommand(
         base='music',
@@ -461,8 +570,8 @@ class Music(commands.Cog):
 
         player = self.get_player(ctx)
 
-        if not player.queue.empty():
-            player.queue._queue.clear()
+        player.queue.clear()
+        player.prefetch()
         player._clear = True
         vc.stop()
         await ctx.reply(f"Cleared the queue.")
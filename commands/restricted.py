@@ -49,6 +49,29 @@ class Restricted(commands.Cog):
         await ctx.send("Rebooting...", hidden=True)
         await self.bot.change_presence(status=discord.Status.dnd, activity=discord.Game("on mc.the-atlas.net"))
         await Utils.reboot()
+
+    @slash.cog_slash(name="metrics",
+                     description="Shows event loop lag and the slowest handlers.",
+                     default_permission=False,
+                     guild_ids=GUILDS)
+    @slash.permission(830345347867476000, 
+                      [
+                          Permission(id=830344767027675166, id_type=SlashCommandPermissionType.USER, permission=True)
+                      ])
+    async def metrics(self, ctx: SlashContext):
+        metrics = self.bot.metrics
+        lag = metrics.loop_lag
+        rows = [f"{'handler':<40} {'calls':>7} {'p50 ms':>8} {'p99 ms':>8}"]
+        for (kind, name), histogram in metrics.slowest():
+            rows.append(f"{name[:40]:<40} {histogram.count:>7} "
+                        f"{histogram.percentile(0.5) * 1000:>8.1f} {histogram.percentile(0.99) * 1000:>8.1f}")
+        embed = Embed(title="Metrics",
+                      description="```\n" + '\n'.join(rows) + "\n```",
+                      color=discord.Color.blurple())
+        embed.add_field(name="Event loop lag",
+                        value=f"p50 `{lag.percentile(0.5) * 1000:.1f}ms` · p99 `{lag.percentile(0.99) * 1000:.1f}ms` · "
+                              f"max `{max(lag.recent, default=0) * 1000:.1f}ms`")
+        await ctx.send(embed=embed, hidden=True)
           
 
 def setup(bot):
@@ -24,6 +24,32 @@ class Roles(commands.Cog):
     def __init__(self, bot):
         self.bot: Bot = bot
         self.verified_role = 877602252209139735
+        self.reset_delay = 3  # seconds between select menu resets during a rush of clicks
+        self._resets = {}  # {message_id: pending reset task}
+
+    def cog_unload(self):
+        for task in self._resets.values():
+            task.cancel()
+
+    def reset_select(self, message):
+        """
+        Resets the role select on `message` once, `reset_delay` seconds after the first click
+        that needs it. Clicks in the meantime share the same edit.
+        """
+        if message.id in self._resets:
+            return
+        self._resets[message.id] = self.bot.loop.create_task(self._reset_select(message))
+
+    async def _reset_select(self, message):
+        try:
+            await asyncio.sleep(self.reset_delay)
+            select, _ = await self.bot.db.roles.getAll()
+            if select is not None:
+                await message.edit(components=[ActionRow(select)])
+        except discord.HTTPException:
+            pass
+        finally:
+            self._resets.pop(message.id, None)
 
     @commands.Cog.listener()
     async def on_component(self, ctx: ComponentContext):
@@ -33,8 +59,7 @@ class Roles(commands.Cog):
             role = ctx.guild.get_role(int(role))
             if role is None:
                 return await ctx.send("That role doesn't seem to exist. Please notify an administrator.", hidden=True)
-            select, _ = await self.bot.db.roles.getAll()
-            await ctx.origin_message.edit(components=[ActionRow(select)]) # just resets the select menu
+            self.reset_select(ctx.origin_message)
             try:
                 if role.id in ctx.author._roles:
                     await ctx.author.remove_roles(role)
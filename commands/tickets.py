@@ -1,11 +1,8 @@
-import io
 import json
 import asyncio
 import re
-import time
-from typing import List
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import discord_slash
 from discord_slash import SlashContext, ComponentContext
 from discord_slash import cog_ext as slash
@@ -17,7 +14,7 @@ from discord_slash.utils.manage_components import create_select_option as Select
 from discord_slash.utils.manage_components import create_actionrow as ActionRow
 from discord_slash.model import ButtonStyle, SlashCommandOptionType as OptionType
 
-from utils.dpy import Embed, message_to_json, save_channel
+from utils.dpy import Embed, TranscriptWriter, message_to_json, save_channel
 from utils.utils import Utils
 from utils.paginator import EmbedPaginator, TextPageSource
 from utils.objects import Ticket, AtlasException
@@ -27,8 +24,7 @@ from bot import Bot, ATLAS
 class Tickets(commands.Cog):
     def __init__(self, bot):
         self.bot: Bot = bot
-        self.ticket_timeout = 60*10 # 10 minutes
-        self._check_tickets.start()
+        self.bot.scheduler.register('ticket_timeout', self.timeout_ticket)
         self.ticket_category = self.bot.config['tickets']['category']
         self.panel = self.bot.config['tickets']['channel']
         self.role = self.bot.config['tickets']['role']
@@ -43,34 +39,31 @@ class Tickets(commands.Cog):
         """
 
     def cog_unload(self):
-        self._check_tickets.cancel()
+        self.bot.scheduler.unregister('ticket_timeout')
 
-    @tasks.loop(seconds=30)
-    async def _check_tickets(self):
+    async def timeout_ticket(self, _id):
+        try:
+            ticket: Ticket = await self.bot.db.tickets.get(_id)
+        except AtlasException:
+            return
+        if ticket.state != 0:
+            return
         guild = self.bot.get_guild(self.bot.guild_id)
-        tickets: List[Ticket] = await self.bot.db.tickets.getAll()
-        for ticket in tickets:
-            if ticket.state == 0:
-                if ticket.created_at + self.ticket_timeout < time.time():
-                    member = guild.get_member(ticket.user)
-                    channel = guild.get_channel(ticket.channel)
-                    if channel is None:
-                        continue
-                    if member:
-                        embed = Embed(
-                            description=f"Your ticket has been deleted because you failed to respond to it within 10 minutes.",
-                            color=discord.Color.red()
-                        )
-                        try:
-                            await member.send(embed=embed)
-                        except discord.HTTPException:
-                            pass
-                    await self.bot.db.tickets.remove(ticket.id)
-                    await channel.delete()
-
-    @_check_tickets.before_loop
-    async def before_check_tickets(self):
-        await self.bot.wait_until_ready()
+        member = guild.get_member(ticket.user)
+        channel = guild.get_channel(ticket.channel)
+        if channel is None:
+            return
+        if member:
+            embed = Embed(
+                description=f"Your ticket has been deleted because you failed to respond to it within 10 minutes.",
+                color=discord.Color.red()
+            )
+            try:
+                await member.send(embed=embed)
+            except discord.HTTPException:
+                pass
+        await self.bot.db.tickets.remove(ticket.id)
+        await channel.delete()
 
     @commands.Cog.listener()
     async def on_component(self, ctx: ComponentContext):
@@ -101,12 +94,14 @@ class Tickets(commands.Cog):
             title="Welcome!",
             description="Thank you for creating a ticket. Please specify why you opened this ticket within 10 minutes, or this ticket will be closed."
         )
+        await self.bot.db.tickets.add(ctx.author.id, channel.id, _id)
         await channel.send(ctx.author.mention, embed=embed)
-        await self.bot.db.tickets.add(ctx.author.id, channel.id)
         await ctx.send(f"Your ticket has been created. {channel.mention}")
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
+        if message.channel.id in self.bot.db.tickets.channels:
+            await self.bot.db.tickets.logMessage(message.channel.id, message.id, 0, message_to_json(message))
         if message.author.bot:
             return
         if message.guild is None:
@@ -127,6 +122,44 @@ class Tickets(commands.Cog):
         await message.reply(f"<@&{self.role}>", embed=Embed(
             description=f"Thank you for your response. A staff member will be with you shortly."
         ))
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        if payload.channel_id not in self.bot.db.tickets.channels:
+            return
+        if 'author' in payload.data:
+            channel = self.bot.get_channel(payload.channel_id)
+            message = discord.Message(state=self.bot._connection, channel=channel, data=payload.data)
+        else:
+            # partial updates (e.g. link embeds loading) are only applied to the cached message
+            message = self.bot._connection._get_message(payload.message_id)
+            if message is None:
+                return
+        await self.bot.db.tickets.logMessage(payload.channel_id, payload.message_id, 1, message_to_json(message))
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if payload.channel_id in self.bot.db.tickets.channels:
+            await self.bot.db.tickets.logMessage(payload.channel_id, payload.message_id, 2)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if payload.channel_id in self.bot.db.tickets.channels:
+            for message_id in payload.message_ids:
+                await self.bot.db.tickets.logMessage(payload.channel_id, message_id, 2)
+
+    async def build_transcript(self, ticket: Ticket, channel: discord.TextChannel) -> TranscriptWriter:
+        """
+        Builds the transcript from the ticket's message log, without any API calls.
+        Falls back to reading the channel history for tickets opened before the log existed.
+        """
+        if not ticket.logged:
+            return await save_channel(channel)
+        writer = TranscriptWriter(channel)
+        async for message in self.bot.db.tickets.getMessages(channel.id):
+            writer.add(message)
+        writer.finish()
+        return writer
         
     @slash.cog_subcommand(
         base="tickets",
@@ -251,17 +284,15 @@ class Tickets(commands.Cog):
             except discord.HTTPException:
                 pass
         await ctx.send(embed=Embed(description=f"Ticket #{ticket.id} closed."), hidden=True)
-        output = await save_channel(channel)
-        _file = io.BytesIO(output.encode('utf-8'))
-        _file.seek(0)
-        _channel = self.bot.get_channel(self.transcript)
-        if _channel is not None:
-            _edit_msg = await _channel.send(file=discord.File(_file, f"ticket-{ticket.id}-{channel.id}.html"))
-            embed = Embed(
-                description=f"Ticket #{ticket.id} (Channel ID: {channel.id}) closed by `{ctx.author} ({ctx.author.id})`: {reason}.\n"
-                            f"Opened By: `{member} ({ticket.user})`\n"
-                            f"[Download Transcript]({_edit_msg.attachments[0].url})")
-            await _edit_msg.edit(embed=embed)
+        with await self.build_transcript(ticket, channel) as transcript:
+            _channel = self.bot.get_channel(self.transcript)
+            if _channel is not None:
+                _edit_msg = await _channel.send(file=discord.File(transcript.fp, f"ticket-{ticket.id}-{channel.id}.html"))
+                embed = Embed(
+                    description=f"Ticket #{ticket.id} (Channel ID: {channel.id}) closed by `{ctx.author} ({ctx.author.id})`: {reason}.\n"
+                                f"Opened By: `{member} ({ticket.user})`\n"
+                                f"[Download Transcript]({_edit_msg.attachments[0].url})")
+                await _edit_msg.edit(embed=embed)
         await asyncio.sleep(5)
         await self.bot.db.tickets.remove(ticket.id)
         await channel.delete()
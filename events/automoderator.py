@@ -1,19 +1,13 @@
-from typing import List
 import discord
 from discord.ext import commands
-from utils.objects import ModAction
-import time
 from utils.dpy import Embed
 from utils.utils import ExpiringCache, Utils
+from utils.wordfilter import WordFilter
 from bot import Bot
 
 class Automoderator(commands.Cog):
     def __init__(self, bot):
         self.bot: Bot = bot
-        with open('data/banned-words.txt', 'r') as f:
-            self.banned_words: List[str] = [w.strip() for w in f.read().splitlines()]
-        with open('data/illegal-words.txt', 'r') as f:
-            self.illegal_words: List[str] = [w.strip() for w in f.read().splitlines()]
         self.warning_threshold = {
             3: (1, 3600),
             6: (1, 172800),
@@ -29,12 +23,59 @@ class Automoderator(commands.Cog):
         self.cons = ExpiringCache(seconds=600)
         self.replace = {
             '0': 'o',
+            '1': 'i',
+            '3': 'e',
+            '4': 'a',
+            '5': 's',
+            '7': 't',
             '!': 'i',
             '$': 's',
             '@': 'a',
             '|': 'l',
-            'ö': 'o',
         }
+        self.filter = WordFilter({
+            'illegal': 'data/illegal-words.txt',
+            'banned': 'data/banned-words.txt',
+        }, replace=self.replace)
+        self.action_roles = {
+            1: self.bot.mute_role,
+            4: self.bot.limbo_role,
+        }
+        self.bot.loop.create_task(self.reconcile_roles())
+
+    async def apply_action_roles(self, member: discord.Member, actions, *, reason=None):
+        """
+        Gives `member` the roles for their active `actions` in a single edit. Returns whether anything changed.
+        """
+        missing = [self.action_roles[a] for a in actions if self.action_roles[a] not in member._roles]
+        if not missing:
+            return False
+        roles = [role for role in member.roles if not role.is_default()]
+        roles.extend(discord.Object(role) for role in missing)
+        await member.edit(roles=roles, reason=reason)
+        return True
+
+    async def reconcile_roles(self):
+        """
+        Gives every cached member the roles for their active mutes and limbos,
+        in case they joined while the bot was offline.
+        """
+        await self.bot.wait_until_ready()
+        guild = self.bot.get_guild(self.bot.guild_id)
+        if guild is None:
+            return
+        fixed = 0
+        for user, actions in (await self.bot.db.mod.getActiveRoleActions()).items():
+            member = guild.get_member(user)
+            if member is None or member.bot:
+                continue
+            try:
+                if await self.apply_action_roles(member, actions, reason="[AUTOMOD]: Reapplying active punishments."):
+                    fixed += 1
+            except discord.HTTPException as e:
+                self.bot.logger.error(f'Could not reapply punishment roles to {member} ({member.id}): {e}')
+        if fixed:
+            self.bot.logger.info(f'Reapplied punishment roles to {fixed} member(s).')
 
     async def warn(self, member: discord.Member):
         reason = "Use of a blacklisted word."
@@ -90,13 +131,9 @@ class Automoderator(commands.Cog):
             return
         if member.bot:
             return
-        actions: List[ModAction] = await self.bot.db.mod.getActions(member.id)
-        for action in actions:
-            if not action.expired and (action.expires is None or action.expires <= time.time()) and action.action_type in (1, 4):
-                if action.action_type == 1:
-                    await member.add_roles(member.guild.get_role(self.bot.mute_role))
-                elif action.action_type == 4:
-                    await member.add_roles(member.guild.get_role(self.bot.limbo_role))
+        active = await self.bot.db.mod.getActiveRoleActions(member.id)
+        if member.id in active:
+            await self.apply_action_roles(member, active[member.id], reason="[AUTOMOD]: Reapplying active punishments.")
 
     @commands.Cog.listener()
     async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
@@ -119,21 +156,15 @@ class Automoderator(commands.Cog):
             return  # Ignore bots
         if message.author.id == self.bot.owner_id or (message.author.guild_permissions.administrator and message.author.id != 554456262994165773):
             return  # Don't check for specific messages
-        content = ' ' + message.content + ' '
-        for k, v in self.replace.items():
-            content = content.replace(k, v)
+        matched = self.filter.match(message.content)
         try:
-            _ill = any([' ' + word + ' ' in ''.join([(e if e.isalnum() else ' ') for e in content.lower()]) for word in self.illegal_words])
-            _ill2 = any([' ' + word + ' ' in ''.join([e for e in content.lower() if e.isalnum() or e == ' ']) for word in self.illegal_words])
-            _bnn = any([' ' + word + ' ' in ''.join([(e if e.isalnum() else ' ') for e in content.lower()]) for word in self.banned_words])
-            _bnn2 = any([' ' + word + ' ' in ''.join([e for e in content.lower() if e.isalnum() or e == ' ']) for word in self.banned_words])
-            if _ill or _ill2:
+            if matched == 'illegal':
                 await message.delete()
                 await message.author.add_roles(message.guild.get_role(self.bot.limbo_role))
                 await self.bot.db.mod.createAction(message.author.id, self.bot.user.id, "Use of a blacklisted word.", 4, 2592000)
                 embed = Embed(description=f'Your message has been deleted because it contains a blacklisted word.\nYou have been sent to limbo for 30 days.', color=discord.Color.red())
                 return await message.author.send(embed=embed)
-            elif _bnn or _bnn2:
+            elif matched == 'banned':
                 await message.delete()
                 embed = Embed(description=f'Your message has been deleted because it contains a blacklisted word.', color=discord.Color.gold())
                 self.cons.append(message.author.id)
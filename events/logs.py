@@ -8,6 +8,7 @@ from utils.paginator import TextPageSource
 from utils.objects import AtlasException
 from utils.utils import ExpiringCache
 from utils.dpy import Embed
+from utils.auditlog import AuditLogDispatcher
 from bot import Bot
 import io
 
@@ -17,9 +18,14 @@ class Logs(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.channel = self.bot.config['logs']['channel']
+        self.dispatcher = AuditLogDispatcher(self.bot, self.channel)
+        self.dispatcher.start()
         self.yes = '<:bit_tick:831435958380658719>'
         self.no = '<:bit_cross:831435958406086666>'
 
+    def cog_unload(self):
+        self.dispatcher.stop()
+
     """
     Messages
     """
@@ -49,11 +55,7 @@ class Logs(commands.Cog):
                 embed.add_field(name='Attachments', value=v)
         embed.set_footer(text=f'Message ID: {message.id}')
         embed.set_author(name=message.guild.name, icon_url=message.guild.icon_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            if files:
-                return await channel.send(embed=embed, files=files)
-            await channel.send(embed=embed)
+        await self.dispatcher.put('message_delete', embed, files)
 
     @commands.Cog.listener()
     async def on_raw_bulk_message_delete(self, payload):
@@ -70,11 +72,7 @@ class Logs(commands.Cog):
         embed = Embed(description=f"{len(payload.message_ids)} messages were deleted in <#{payload.channel_id}>")
         guild = self.bot.get_guild(payload.guild_id)
         embed.set_author(name=guild.name, icon_url=guild.icon_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            if files:
-                return await channel.send(embed=embed, files=files)
-            await channel.send(embed=embed)
+        await self.dispatcher.put('raw_bulk_message_delete', embed, files)
         
             
     @commands.Cog.listener()
@@ -106,11 +104,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Old Attachments', value=', '.join(f"({a.filename})[{a.proxy_url}]" for a in before.attachments))
         embed.set_footer(text=f'Message ID: {before.id}')
         embed.set_author(name=before.guild.name, icon_url=before.guild.icon_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            if files:
-                return await channel.send(embed=embed, files=files)
-            await channel.send(embed=embed)
+        await self.dispatcher.put('message_edit', embed, files)
 
     """
     Roles
@@ -131,9 +125,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Managed', value=f"This role is the guild's boost role.")
         embed.set_footer(text=f'Role ID: {role.id}')
         embed.set_author(name=role.guild.name, icon_url=role.guild.icon_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            await channel.send(embed=embed)
+        await self.dispatcher.put('role_create', embed)
 
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role: discord.Role):
@@ -147,9 +139,7 @@ class Logs(commands.Cog):
         embed.add_field(name='Mentionable', value=self.yes if role.mentionable else self.no)
         embed.set_footer(text=f'Role ID: {role.id}')
         embed.set_author(name=role.guild.name, icon_url=role.guild.icon_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            await channel.send(embed=embed)
+        await self.dispatcher.put('role_delete', embed)
 
     @commands.Cog.listener()
     async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
@@ -169,9 +159,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Mentionable', value=f"{self.yes if before.mentionable else self.no} ➜ {self.yes if after.mentionable else self.no}" )
         embed.set_footer(text=f'Role ID: {before.id}')
         embed.set_author(name=before.guild.name, icon_url=before.guild.icon_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            await channel.send(embed=embed)
+        await self.dispatcher.put('role_update', embed)
 
     """
     Channels
@@ -188,9 +176,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Category', value=str(channel.category))
             embed.set_footer(text=f'Channel ID: {channel.id}')
             embed.set_author(name=channel.guild.name, icon_url=channel.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_create', embed)
         else:
             embed = Embed(description=f'Category {channel.name} created.', 
                                   color=discord.Color.blurple())
@@ -198,9 +184,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Type', value="Category")
             embed.set_footer(text=f'Channel ID: {channel.id}')
             embed.set_author(name=channel.guild.name, icon_url=channel.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_create', embed)
         
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel: CHANNEL):
@@ -217,9 +201,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Category', value=str(channel.category))
             embed.set_footer(text=f'Channel ID: {channel.id}')
             embed.set_author(name=channel.guild.name, icon_url=channel.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_delete', embed)
         elif isinstance(channel, discord.VoiceChannel):
             embed = Embed(description=f'Channel #{channel.name} deleted.',
                                     color=discord.Color.blurple())
@@ -231,9 +213,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Category', value=str(channel.category))
             embed.set_footer(text=f'Channel ID: {channel.id}')
             embed.set_author(name=channel.guild.name, icon_url=channel.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_delete', embed)
         elif isinstance(channel, discord.CategoryChannel):
             embed = Embed(description=f'Category {channel.name} deleted.',
                                     color=discord.Color.blurple())
@@ -241,9 +221,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Type', value="Category")
             embed.set_footer(text=f'Channel ID: {channel.id}')
             embed.set_author(name=channel.guild.name, icon_url=channel.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_delete', embed)
         elif isinstance(channel, discord.StageChannel):
             embed = Embed(description=f'Channel #{channel.name} deleted.',
                                     color=discord.Color.blurple())
@@ -255,9 +233,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Category', value=str(channel.category))
             embed.set_footer(text=f'Channel ID: {channel.id}')
             embed.set_author(name=channel.guild.name, icon_url=channel.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_delete', embed)
 
     @commands.Cog.listener()
     async def on_guild_channel_update(self, before: CHANNEL, after: CHANNEL):
@@ -280,9 +256,7 @@ class Logs(commands.Cog):
                 embed.add_field(name='Slowmode', value=f"{before.slowmode_delay} seconds ➜ {after.slowmode_delay} seconds")
             embed.set_footer(text=f'Channel ID: {after.id}')
             embed.set_author(name=after.guild.name, icon_url=after.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_update', embed)
         elif isinstance(after, discord.VoiceChannel):
             if not any([before.name != after.name, before.bitrate != after.bitrate, before.user_limit != after.user_limit, before.rtc_region != after.rtc_region]):
                 return
@@ -299,9 +273,7 @@ class Logs(commands.Cog):
                 embed.add_field(name='Region', value=f'{str(before.rtc_region)} ➜ {str(after.rtc_region)}')
             embed.set_footer(text=f'Channel ID: {after.id}')
             embed.set_author(name=after.guild.name, icon_url=after.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_update', embed)
         elif isinstance(after, discord.CategoryChannel):
             if before.name == after.name:
                 return
@@ -311,9 +283,7 @@ class Logs(commands.Cog):
             embed.add_field(name='Type', value=f"Category")
             embed.set_footer(text=f'Channel ID: {after.id}')
             embed.set_author(name=after.guild.name, icon_url=after.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_update', embed)
         elif isinstance(after, discord.StageChannel):
             if not any([before.name != after.name, before.bitrate != after.bitrate, before.user_limit != after.user_limit, before.rtc_region != after.rtc_region, before.category != after.category]):
                 return
@@ -332,9 +302,7 @@ class Logs(commands.Cog):
                 embed.add_field(name='Category', value=f'{before.category} ➜ {after.category}')
             embed.set_footer(text=f'Channel ID: {after.id}')
             embed.set_author(name=after.guild.name, icon_url=after.guild.icon_url)
-            channel = self.bot.get_channel(self.channel)
-            if channel is not None:
-                await channel.send(embed=embed)
+            await self.dispatcher.put('channel_update', embed)
 
     """
     Users
@@ -348,9 +316,7 @@ class Logs(commands.Cog):
         embed.set_footer(text=f'User ID: {member.id}')
         embed.set_author(name=member.guild.name, icon_url=member.guild.icon_url)
         embed.set_thumbnail(url=member.avatar_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            await channel.send(embed=embed)
+        await self.dispatcher.put('member_join', embed)
         
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
@@ -360,9 +326,7 @@ class Logs(commands.Cog):
                                 color=discord.Color.blurple())
         embed.set_author(name=member.guild.name, icon_url=member.guild.icon_url)
         embed.set_thumbnail(url=member.avatar_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            await channel.send(embed=embed)
+        await self.dispatcher.put('member_remove', embed)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
@@ -388,9 +352,7 @@ class Logs(commands.Cog):
         embed.set_footer(text=f'User ID: {after.id}')
         embed.set_author(name=after.guild.name, icon_url=after.guild.icon_url)
         embed.set_thumbnail(url=after.avatar_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            await channel.send(embed=embed)
+        await self.dispatcher.put('member_update', embed)
 
     @commands.Cog.listener()
     async def on_member_ban(self, guild: discord.Guild, user: discord.User):
@@ -400,9 +362,7 @@ class Logs(commands.Cog):
                                 color=discord.Color.blurple())
         embed.set_author(name=guild.name, icon_url=guild.icon_url)
         embed.set_thumbnail(url=user.avatar_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            await channel.send(embed=embed)
+        await self.dispatcher.put('member_ban', embed)
 
     @commands.Cog.listener()
     async def on_member_unban(self, guild: discord.Guild, user: discord.User):
@@ -412,9 +372,7 @@ class Logs(commands.Cog):
                                 color=discord.Color.blurple())
         embed.set_author(name=guild.name, icon_url=guild.icon_url)
         embed.set_thumbnail(url=user.avatar_url)
-        channel = self.bot.get_channel(self.channel)
-        if channel is not None:
-            await channel.send(embed=embed)
+        await self.dispatcher.put('member_unban', embed)
 
 
 def setup(bot):
@@ -1,29 +1,117 @@
+import asyncio
 import discord
-from discord.ext import commands, tasks
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from discord.ext import commands
+from time import time
 from bot import Bot
 
 class MemberCount(commands.Cog):
+    """
+    Keeps the member and booster counter channels up to date.
+
+    Join, leave and boost events queue a rename for the counter they affect.
+    While one is queued, further events only change the count it will read,
+    so a burst of joins ends in a single edit. A rename is skipped when the
+    name is unchanged. Discord allows `renames` renames per channel every
+    `rename_window` seconds, so further renames wait until a slot frees up.
+    Renames made shortly before a restart are read back from the audit log.
+    Each rename runs as its own scheduler job, so waiting out a 429 doesn't hold up other jobs.
+    """
+
+    delay = 5
+    renames = 2
+    rename_window = 600
+
     def __init__(self, bot) -> None:
         self.bot: Bot = bot
         self.member_count = 888259843130024007
         self.booster_count = 888259895500103741
-        self.update.start()
+        self.renamed = {}  # {channel_id: deque of rename timestamps}
+        self._loaded = False
+        self._loading = asyncio.Lock()
+        self.bot.scheduler.register('counter_rename', self.rename)
+        for channel_id in (self.member_count, self.booster_count):
+            self.bot.scheduler.schedule(('counter_rename', channel_id), time())
+
+    def cog_unload(self):
+        for channel_id in (self.member_count, self.booster_count):
+            self.bot.scheduler.cancel(('counter_rename', channel_id))
+        self.bot.scheduler.unregister('counter_rename')
+
+    def counter_name(self, channel_id: int, guild: discord.Guild) -> str:
+        if channel_id == self.member_count:
+            return f"✦ Members: {guild.member_count}"
+        return f"✦ Boosters: {guild.premium_subscription_count}"
+
+    def queue(self, channel_id: int):
+        key = ('counter_rename', channel_id)
+        if key not in self.bot.scheduler:
+            self.bot.scheduler.schedule(key, max(time() + self.delay, self.next_slot(channel_id)))
+
+    def next_slot(self, channel_id: int) -> float:
+        renamed = self.renamed.get(channel_id)
+        if renamed is None or len(renamed) < self.renames:
+            return 0
+        return renamed[0] + self.rename_window
 
-    @tasks.loop(minutes=10)
-    async def update(self):
+    async def load_renames(self, guild: discord.Guild):
+        """
+        Seeds the rename history with the bot's own recent renames from the audit log.
+        If the audit log can't be read, both counters are treated as having used up the window.
+        """
+        async with self._loading:
+            if self._loaded:
+                return
+            channels = (self.member_count, self.booster_count)
+            since = datetime.utcnow() - timedelta(seconds=self.rename_window)
+            try:
+                async for entry in guild.audit_logs(limit=100, user=guild.me, after=since,
+                                                    action=discord.AuditLogAction.channel_update):
+                    if entry.target.id in channels and getattr(entry.after, 'name', None) is not None:
+                        when = entry.created_at.replace(tzinfo=timezone.utc).timestamp()
+                        self.renamed.setdefault(entry.target.id, deque(maxlen=self.renames)).append(when)
+            except discord.HTTPException:
+                for channel_id in channels:
+                    self.renamed[channel_id] = deque([time()] * self.renames, maxlen=self.renames)
+            self._loaded = True
+
+    async def rename(self, channel_id: int):
         guild = self.bot.get_guild(self.bot.guild_id)
-        if guild is None:
+        channel = self.bot.get_channel(channel_id)
+        if guild is None or channel is None:
+            return
+        if not self._loaded:
+            await self.load_renames(guild)
+        name = self.counter_name(channel_id, guild)
+        if channel.name == name:
+            return
+        slot = self.next_slot(channel_id)
+        if slot > time():
+            self.bot.scheduler.schedule(('counter_rename', channel_id), slot)
             return
-        member_count = self.bot.get_channel(self.member_count)
-        booster_count = self.bot.get_channel(self.booster_count)
-        if member_count is not None:
-            await member_count.edit(name=f"✦ Members: {len(guild.members)}")
-        if booster_count is not None:
-            await booster_count.edit(name=f"✦ Boosters: {guild.premium_subscription_count}")
+        self.renamed.setdefault(channel_id, deque(maxlen=self.renames)).append(time())
+        await channel.edit(name=name)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        if member.guild.id == self.bot.guild_id:
+            self.queue(self.member_count)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        if member.guild.id == self.bot.guild_id:
+            self.queue(self.member_count)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        if after.id == self.bot.guild_id and before.premium_subscription_count != after.premium_subscription_count:
+            self.queue(self.booster_count)
 
-    @update.before_loop
-    async def before_update(self):
-        await self.bot.wait_until_ready()
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if after.guild.id == self.bot.guild_id and before.premium_since != after.premium_since:
+            self.queue(self.booster_count)
 
 def setup(bot):
-    bot.add_cog(MemberCount(bot))
\ No newline at end of file
+    bot.add_cog(MemberCount(bot))
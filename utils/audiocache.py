@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class AudioCache:
+    """
+    An on-disk LRU of tracks transcoded to Ogg/Opus.
+
+    Once a track has started playing `store_after` times, an FFmpeg process
+    saves it in the background, copying the audio if the stream is already
+    Opus. That process downloads the stream a second time alongside the one
+    being played, so the play that fills the cache costs double bandwidth.
+    A cached track plays from disk with no extraction or download, and at
+    normal volume with no re-encode. When the files outgrow `max_size` bytes,
+    the least recently played ones are deleted. Play counts are kept for the
+    `max_tracked` most recently played uncached tracks.
+    """
+
+    max_tracked = 1000
+
+    fields = ('uploader', 'uploader_url', 'upload_date', 'title', 'thumbnail', 'description', 'duration', 'tags',
+              'webpage_url', 'view_count', 'like_count', 'dislike_count', 'acodec')
+
+    def __init__(self, bot, path: str, *, max_size: int, store_after: int = 2):
+        self.bot = bot
+        self.path = path
+        self.max_size = max_size
+        self.store_after = store_after
+        self.size = 0
+        self._files = OrderedDict()  # {name: size}, least recently played first
+        self._plays = OrderedDict()  # {name: plays}, least recently played first
+        self._storing = {}  # {name: Task}
+        os.makedirs(path, exist_ok=True)
+        found = []
+        for entry in os.scandir(path):
+            name, ext = os.path.splitext(entry.name)
+            if ext == '.part':
+                os.remove(entry.path)
+            elif ext == '.opus' and os.path.exists(self._file(name, '.json')):
+                stat = entry.stat()
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._files[name] = size
+            self.size += size
+
+    @staticmethod
+    def _name(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def _file(self, name: str, ext: str) -> str:
+        return os.path.join(self.path, name + ext)
+
+    def __contains__(self, url: str) -> bool:
+        return self._name(url) in self._files
+
+    def get(self, url: str) -> Optional[Tuple[str, dict]]:
+        """
+        Returns the cached file for `url` and the info saved with it, marking it as recently played.
+        """
+        name = self._name(url)
+        if name not in self._files:
+            return None
+        path = self._file(name, '.opus')
+        try:
+            with open(self._file(name, '.json'), 'r') as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self._delete(name)
+            return None
+        self._files.move_to_end(name)
+        return path, data
+
+    def played(self, data: dict):
+        """
+        Counts a play of an uncached track and starts saving it once it has been played `store_after` times.
+        """
+        name = self._name(data['webpage_url'])
+        self._plays[name] = self._plays.get(name, 0) + 1
+        self._plays.move_to_end(name)
+        while len(self._plays) > self.max_tracked:
+            self._plays.popitem(last=False)
+        if self._plays[name] >= self.store_after and name not in self._files and name not in self._storing:
+            self._storing[name] = self.bot.loop.create_task(self._store(name, data))
+
+    def stop(self):
+        for task in self._storing.values():
+            task.cancel()
+
+    async def _store(self, name: str, data: dict):
+        part = self._file(name, '.part')
+        if data.get('acodec') == 'opus':
+            codec = ('-c:a', 'copy')
+        else:
+            codec = ('-c:a', 'libopus', '-b:a', '128k', '-ar', '48000', '-ac', '2')
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'ffmpeg', '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                '-nostats', '-loglevel', '0', '-y', '-i', data['url'], '-vn', *codec, '-f', 'opus', part,
+                stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            if await process.wait() != 0:
+                raise OSError(f'ffmpeg exited with status {process.returncode}')
+            with open(self._file(name, '.json'), 'w') as f:
+                json.dump({key: data.get(key) for key in self.fields}, f)
+            os.replace(part, self._file(name, '.opus'))
+        except asyncio.CancelledError:
+            if process is not None and process.returncode is None:
+                process.kill()
+            self._remove(part)
+            raise
+        except Exception as e:
+            if process is not None and process.returncode is None:
+                process.kill()
+            self.bot.logger.error(f'Could not cache {data.get("webpage_url")}: {e}')
+            self._remove(part)
+            self._remove(self._file(name, '.json'))
+            return
+        finally:
+            self._storing.pop(name, None)
+        size = os.path.getsize(self._file(name, '.opus'))
+        self._files[name] = size
+        self.size += size
+        self._plays.pop(name, None)
+        while self.size > self.max_size and len(self._files) > 1:
+            self._delete(next(iter(self._files)))
+
+    def _delete(self, name: str):
+        self.size -= self._files.pop(name, 0)
+        self._remove(self._file(name, '.opus'))
+        self._remove(self._file(name, '.json'))
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import List
+
+import discord
+from discord.http import Route
+
+from utils.dpy import Embed
+
+
+class LogEntry:
+    __slots__ = ('kind', 'embed', 'files', 'created')
+
+    def __init__(self, kind: str, embed: Embed, files: List[discord.File] = None):
+        self.kind = kind
+        self.embed = embed
+        self.files = files or []
+        self.created = time.time()
+
+
+class AuditLogDispatcher:
+    """
+    Sends audit log embeds to one channel from a single worker.
+
+    Once an entry arrives, the worker waits `linger` seconds to collect more.
+    It then sends them up to 10 embeds per message, at most one message every
+    `send_interval` seconds. That keeps the log channel inside its rate limit
+    and leaves the global limit for moderation actions. When `coalesce_after`
+    or more entries of a kind in `bursts` land in the same batch, they are
+    folded into one summary such as "50 members joined in 10s". The queue is
+    bounded, so listeners wait once `max_pending` entries are unsent. `stop`
+    sends whatever is left instead of dropping it.
+    """
+
+    linger = 2
+    send_interval = 1
+    coalesce_after = 5
+    max_pending = 500
+    max_embeds = 10
+    max_chars = 6000
+    max_description = 4096
+    max_line = 200
+    bursts = {
+        'message_delete': 'messages deleted',
+        'message_edit': 'messages edited',
+        'role_create': 'roles created',
+        'role_delete': 'roles deleted',
+        'role_update': 'roles updated',
+        'channel_create': 'channels created',
+        'channel_delete': 'channels deleted',
+        'channel_update': 'channels updated',
+        'member_join': 'members joined',
+        'member_remove': 'members left',
+        'member_update': 'members updated',
+        'member_ban': 'users banned',
+        'member_unban': 'users unbanned',
+    }
+
+    def __init__(self, bot, channel_id: int):
+        self.bot = bot
+        self.channel_id = channel_id
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self._batch = []  # entries collected while lingering
+        self._outbox = []  # packed (embeds, files) messages not yet sent
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self):
+        """
+        Stops the worker and sends everything still lingering, queued or unsent in one last pass.
+        """
+        if self._task is not None:
+            self._task.cancel()
+        batch, self._batch = self._batch, []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch or self._outbox:
+            self.bot.loop.create_task(self._flush(batch))
+
+    async def put(self, kind: str, embed: Embed, files: List[discord.File] = None):
+        await self.queue.put(LogEntry(kind, embed, files))
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                self._batch.append(await self.queue.get())
+                await asyncio.sleep(self.linger)
+                while not self.queue.empty() and len(self._batch) < self.max_pending:
+                    self._batch.append(self.queue.get_nowait())
+                batch, self._batch = self._batch, []
+                await self._flush(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A batch that can't be coalesced or packed is dropped, so the worker keeps draining the queue.
+                self.bot.logger.error(f'Could not process audit log batch: {e}')
+                self._batch = []
+
+    async def _flush(self, batch: List[LogEntry]):
+        self._outbox.extend(self._pack(self._coalesce(batch)))
+        while self._outbox:
+            embeds, files = self._outbox[0]
+            try:
+                await self._send(embeds, files)
+            except Exception as e:
+                self.bot.logger.error(f'Could not send audit log: {e}')
+            del self._outbox[0]
+            await asyncio.sleep(self.send_interval)
+
+    def _coalesce(self, batch: List[LogEntry]):
+        """
+        Yields `(embed, files)` in batch order, with each burst replaced by its
+        summary at the position of its first entry.
+        """
+        groups = defaultdict(list)
+        for entry in batch:
+            if entry.kind in self.bursts and not entry.files:
+                groups[entry.kind].append(entry)
+        folded = {kind for kind, entries in groups.items() if len(entries) >= self.coalesce_after}
+        for entry in batch:
+            if entry.kind not in folded or entry.files:
+                yield entry.embed, entry.files
+            elif entry is groups[entry.kind][0]:
+                for embed in self._summarize(entry.kind, groups[entry.kind]):
+                    yield embed, []
+
+    def _line(self, embed: Embed) -> str:
+        parts = [str(embed.description or '').split('\n')[0]]
+        parts.extend(f"{field.name}: {field.value}" for field in embed.fields)
+        line = ' · '.join(parts)
+        return line if len(line) <= self.max_line else line[:self.max_line - 1] + '…'
+
+    def _summarize(self, kind: str, entries: List[LogEntry]):
+        span = round(entries[-1].created - entries[0].created)
+        title = f"{len(entries)} {self.bursts[kind]} in {span}s"
+        description = ''
+        for entry in entries:
+            line = self._line(entry.embed)
+            if len(description) + len(line) + 1 > self.max_description:
+                yield Embed(title=title, description=description, color=discord.Color.blurple())
+                description = ''
+            description += line + '\n'
+        yield Embed(title=title, description=description, color=discord.Color.blurple())
+
+    def _pack(self, items):
+        """
+        Groups embeds into messages of at most `max_embeds` embeds and
+        `max_chars` characters. Entries with attachments are sent on their own.
+        """
+        embeds, chars = [], 0
+        for embed, files in items:
+            if files:
+                if embeds:
+                    yield embeds, []
+                    embeds, chars = [], 0
+                yield [embed], files
+                continue
+            if embeds and (len(embeds) == self.max_embeds or chars + len(embed) > self.max_chars):
+                yield embeds, []
+                embeds, chars = [], 0
+            embeds.append(embed)
+            chars += len(embed)
+        if embeds:
+            yield embeds, []
+
+    async def _send(self, embeds: List[Embed], files: List[discord.File]):
+        channel = self.bot.get_channel(self.channel_id)
+        if channel is None:
+            return
+        if files:
+            return await channel.send(embed=embeds[0], files=files)
+        # Messageable.send only takes a single embed, so multi-embed messages go through the route directly.
+        await self.bot.http.request(Route('POST', '/channels/{channel_id}/messages', channel_id=channel.id),
+                                    json={'embeds': [embed.to_dict() for embed in embeds]})
@@ -1,5 +1,6 @@
 import asyncio
-from typing import List, Tuple
+import json
+from typing import Dict, List, Optional, Set, Tuple
 from utils.dpy import Embed
 
 import discord
@@ -12,17 +13,40 @@ import random
 
 from utils.objects import ModAction, Suggestion, AtlasException, LevelUser, Ticket, BirthdayUser
 from utils.utils import Utils
+from utils.scheduler import DeadlineScheduler
 
 from discord_slash.utils.manage_components import create_select as Select
 from discord_slash.utils.manage_components import create_select_option as SelectOption
 
+class IDSequence:
+    """
+    Hands out IDs for a table without scanning it.
+    The counter is seeded once from MAX(ID) and then kept in memory, so concurrent callers never share an ID.
+    """
+    def __init__(self, pool, table, column='ID'):
+        self.pool: aiosqlite.Connection = pool
+        self.table = table
+        self.column = column
+        self._next = None
+        self._lock = asyncio.Lock()
+
+    async def next(self):
+        async with self._lock:
+            if self._next is None:
+                async with self.pool.execute(f"SELECT MAX({self.column}) FROM {self.table};") as cursor:
+                    row = await cursor.fetchone()
+                self._next = (row[0] if row[0] is not None else -1) + 1
+            _id = self._next
+            self._next += 1
+            return _id
+
 class Mod_Actions:
     table = 'ACTIONS'
     init_query = "CREATE TABLE IF NOT EXISTS {} (" \
                  "USERID INT NOT NULL," \
                  "MODERATOR INT NOT NULL," \
                  "REASON TEXT NOT NULL," \
-                 "ID INT NOT NULL," \
+                 "ID INTEGER NOT NULL PRIMARY KEY," \
                  "TIME INT NOT NULL, " \
                  "EXPIRES INT, " \
                  "ACTION INT NOT NULL," \
@@ -32,82 +56,84 @@ class Mod_Actions:
     def __init__(self, bot, pool):
         self.bot = bot
         self.pool: aiosqlite.Connection = pool
+        self.ids = IDSequence(pool, self.table)
         self.log_channel = bot.config['moderation']['logs']
-        bot.loop.create_task(self.init())
-        self.undoActions.start()
+        self.expiries = DeadlineScheduler(bot, self.undoAction, retry=60)
+        bot.loop.create_task(self.loadExpiries())
 
     async def init(self):
         await self.pool.execute(self.init_query.format(self.table))
 
     async def close(self):
-        self.undoActions.cancel()
+        self.expiries.stop()
+
+    async def loadExpiries(self):
+        await self.bot.wait_until_ready()
+        async with self.pool.execute(f"SELECT ID, EXPIRES FROM {self.table} WHERE EXPIRED = FALSE AND EXPIRES IS NOT NULL;") as cursor:
+            async for row in cursor:
+                self.expiries.schedule(row[0], row[1])
+        self.expiries.start()
 
-    @tasks.loop(minutes=1)
-    async def undoActions(self):
+    async def undoAction(self, _id):
         guild = self.bot.get_guild(self.bot.guild_id)
-        actions = await self.getAllActions()
-        rows: List[ModAction] = [a for a in actions if not a.expired and a.expires is not None and a.expires < int(time())]
+        try:
+            row = await self.getAction(_id)
+        except AtlasException:
+            return
+        if row.expired:
+            return
         log_channel = self.bot.get_channel(self.log_channel)
-        for row in rows:
-            if row.action_type == 0:
-                pass
-            elif row.action_type == 1:
-                member = guild.get_member(row.user)
-                if member is not None:
-                    if self.bot.mute_role in member._roles:
-                        await member.remove_roles(guild.get_role(self.bot.mute_role))
-                        try:
-                            embed = Embed(description=f'Your mute in {guild.name} has expired.', color=discord.Color.green())
-                            await member.send(embed=embed)
-                        except discord.HTTPException:
-                            pass
-                        embed = Embed(title="Unmute", description=f"Member: {member.mention}\nModerator: {self.bot.user.mention}", color=discord.Color.green())
-                        if log_channel is not None:
-                            await log_channel.send(embed=embed)
-            elif row.action_type == 2:
+        if row.action_type == 0:
+            pass
+        elif row.action_type == 1:
+            member = guild.get_member(row.user)
+            if member is not None:
+                if self.bot.mute_role in member._roles:
+                    await member.remove_roles(guild.get_role(self.bot.mute_role))
+                    try:
+                        embed = Embed(description=f'Your mute in {guild.name} has expired.', color=discord.Color.green())
+                        await member.send(embed=embed)
+                    except discord.HTTPException:
+                        pass
+                    embed = Embed(title="Unmute", description=f"Member: {member.mention}\nModerator: {self.bot.user.mention}", color=discord.Color.green())
+                    if log_channel is not None:
+                        await log_channel.send(embed=embed)
+        elif row.action_type == 2:
+            pass
+        elif row.action_type == 3:
+            try:
+                await guild.unban(discord.Object(row.user))
+            except discord.NotFound:
                 pass
-            elif row.action_type == 3:
-                try:
-                    await guild.unban(discord.Object(row.user))
-                except discord.NotFound:
-                    pass
-                else:
-                    member = await self.bot.get_or_fetch_user(row.user)
-                    if member is not None:
-                        try:
-                            embed = Embed(description=f'Your ban in {guild.name} has expired. You can rejoin at https://discord.the-atlas.net/.', color=discord.Color.green())
-                            await member.send(embed=embed)
-                        except discord.HTTPException:
-                            pass
-                        embed = Embed(title="Unban", description=f"Member: {member.mention}\nModerator: {self.bot.user.mention}", color=discord.Color.green())
-                        if log_channel is not None:
-                            await log_channel.send(embed=embed)
-            elif row.action_type == 4:
-                member = guild.get_member(row.user)
+            else:
+                member = await self.bot.get_or_fetch_user(row.user)
                 if member is not None:
-                    if self.bot.limbo_role not in member._roles:
-                        await member.add_roles(guild.get_role(self.bot.limbo_role))
-                        try:
-                            embed = Embed(description=f'Your limbo in {guild.name} has expired.', color=discord.Color.green())
-                            await member.send(embed=embed)
-                        except discord.HTTPException:
-                            pass
-                        embed = Embed(title="Unlimbo", description=f"Member: {member.mention}\nModerator: {self.bot.user.mention}", color=discord.Color.green())
-                        if log_channel is not None:
-                            await log_channel.send(embed=embed)
-            await self.pool.execute(f"UPDATE {self.table} SET EXPIRED = TRUE WHERE ID = ?;", (row.id,))
-            await self.pool.commit()
+                    try:
+                        embed = Embed(description=f'Your ban in {guild.name} has expired. You can rejoin at https://discord.the-atlas.net/.', color=discord.Color.green())
+                        await member.send(embed=embed)
+                    except discord.HTTPException:
+                        pass
+                    embed = Embed(title="Unban", description=f"Member: {member.mention}\nModerator: {self.bot.user.mention}", color=discord.Color.green())
+                    if log_channel is not None:
+                        await log_channel.send(embed=embed)
+        elif row.action_type == 4:
+            member = guild.get_member(row.user)
+            if member is not None:
+                if self.bot.limbo_role not in member._roles:
+                    await member.add_roles(guild.get_role(self.bot.limbo_role))
+                    try:
+                        embed = Embed(description=f'Your limbo in {guild.name} has expired.', color=discord.Color.green())
+                        await member.send(embed=embed)
+                    except discord.HTTPException:
+                        pass
+                    embed = Embed(title="Unlimbo", description=f"Member: {member.mention}\nModerator: {self.bot.user.mention}", color=discord.Color.green())
+                    if log_channel is not None:
+                        await log_channel.send(embed=embed)
+        await self.pool.execute(f"UPDATE {self.table} SET EXPIRED = TRUE WHERE ID = ?;", (row.id,))
+        await self.pool.commit()
 
-    @undoActions.before_loop
-    async def wait(self):
-        await self.bot.wait_until_ready()
-        
     async def getNewID(self):
-        _id = -1
-        async with self.pool.execute(f"SELECT * from {self.table};") as cursor:
-            async for row in cursor:
-                _id = max(row[3], _id)
-        return _id + 1
+        return await self.ids.next()
 
     async def getAllActions(self):
         ret = []
@@ -135,6 +161,8 @@ class Mod_Actions:
         _id = await self.getNewID()
         await self.pool.execute(f"INSERT INTO {self.table} VALUES (?,?,?,?,?,?,?,?);", (user, moderator, reason, _id, now, exp, action, False))
         await self.pool.commit()
+        if exp is not None:
+            self.expiries.schedule(_id, exp)
         log_channel = self.bot.get_channel(self.log_channel)
         dur = Utils.humanTimeDuration(duration) if duration else 'Indefinite'
         _type = 'Warn' if action == 0 else ('Mute' if action == 1 else ('Kick' if action == 2 else ('Ban' if action == 3 else ('Limbo' if action == 4 else 'Unknown'))))
@@ -156,6 +184,39 @@ class Mod_Actions:
                 ret.append(ModAction(row))
         return ret
 
+    async def getActiveRoleActions(self, user=None) -> Dict[int, Set[int]]:
+        """
+        Returns `{user: {action types}}` for unexpired mutes and limbos, for one user or everyone.
+        """
+        query = f"SELECT DISTINCT USERID, ACTION FROM {self.table} " \
+                f"WHERE EXPIRED = FALSE AND ACTION IN (1, 4) AND (EXPIRES IS NULL OR EXPIRES > ?)"
+        params = (int(time()),)
+        if user is not None:
+            query += " AND USERID = ?"
+            params += (user,)
+        ret = {}
+        async with self.pool.execute(query + ";", params) as cursor:
+            async for row in cursor:
+                ret.setdefault(row[0], set()).add(row[1])
+        return ret
+
+    async def countActions(self, user, _type=None):
+        query = f"SELECT COUNT(*) FROM {self.table} WHERE USERID = ?" + (" AND ACTION = ?;" if _type is not None else ";")
+        params = (user, _type) if _type is not None else (user,)
+        async with self.pool.execute(query, params) as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    async def getActionsPage(self, user, offset, limit, _type=None):
+        ret = []
+        query = f"SELECT * FROM {self.table} WHERE USERID = ?" + (" AND ACTION = ?" if _type is not None else "") + \
+                " ORDER BY ID LIMIT ? OFFSET ?;"
+        params = (user, _type) if _type is not None else (user,)
+        async with self.pool.execute(query, (*params, limit, offset)) as cursor:
+            async for row in cursor:
+                ret.append(ModAction(row))
+        return ret
+
     async def getAction(self, _id):
         async with self.pool.execute(f"SELECT * FROM {self.table} WHERE ID = ?;", (_id,)) as cursor:
             async for row in cursor:
@@ -166,12 +227,14 @@ class Mod_Actions:
         action = await self.getAction(_id)
         await self.pool.execute(f"DELETE FROM {self.table} WHERE ID = ?;", (_id,))
         await self.pool.commit()
+        self.expiries.cancel(_id)
         return action
 
     async def expireAction(self, _id):
         await self.getAction(_id)
         await self.pool.execute(f"UPDATE {self.table} SET EXPIRED = TRUE WHERE ID = ?;", (_id,))
         await self.pool.commit()
+        self.expiries.cancel(_id)
 
     async def setReason(self, _id, reason):
         await self.getAction(_id)
@@ -184,14 +247,14 @@ class Suggestions:
                  "USERID INT NOT NULL," \
                  "MESSAGEID INT NOT NULL," \
                  "SUGGESTION TEXT NOT NULL," \
-                 "ID INT NOT NULL," \
+                 "ID INTEGER NOT NULL PRIMARY KEY," \
                  "STATUS BOOLEAN NOT NULL DEFAULT FALSE" \
                  ");"
 
     def __init__(self, bot, pool):
         self.bot = bot
         self.pool: aiosqlite.Connection = pool
-        bot.loop.create_task(self.init())
+        self.ids = IDSequence(pool, self.table)
 
     async def init(self):
         await self.pool.execute(self.init_query.format(self.table))
@@ -201,11 +264,7 @@ class Suggestions:
         pass
 
     async def getNewID(self):
-        _id = -1
-        async with self.pool.execute(f"SELECT * from {self.table};") as cursor:
-            async for row in cursor:
-                _id = max(row[3], _id)
-        return _id + 1
+        return await self.ids.next()
 
     async def get(self, _id):
         async with self.pool.execute(f"SELECT * FROM {self.table} WHERE ID = ?;", (_id,)) as cursor:
@@ -288,58 +347,137 @@ class Suggestions:
 class Leveling:
     table = 'LEVELS'
     init_query = "CREATE TABLE IF NOT EXISTS {} (" \
-                 "USERID INT NOT NULL," \
+                 "USERID INTEGER NOT NULL PRIMARY KEY," \
                  "MESSAGES INT NOT NULL," \
                  "XP INT NOT NULL" \
                  ");"
+    flush_threshold = 100  # buffered events before an early flush
 
     def __init__(self, bot, pool):
         self.bot = bot
         self.pool: aiosqlite.Connection = pool
-        bot.loop.create_task(self.init())
+        self._pending: Dict[int, List[int]] = {}  # {user: [messages, xp]}
+        self._pending_events = 0
+        self._flush_lock = asyncio.Lock()
+        self._flushing: Optional[asyncio.Task] = None  # early flush started by _buffer
+        self.flushBuffer.start()
 
     async def init(self):
         await self.pool.execute(self.init_query.format(self.table))
         await self.pool.commit()
 
     async def close(self):
-        pass
+        self.flushBuffer.cancel()
+        await self.flush()
+
+    @tasks.loop(seconds=5)
+    async def flushBuffer(self):
+        await self._flushQuietly()
+
+    async def _flushQuietly(self):
+        # Background flushes must not raise: an error would stop the loop or go unretrieved in a task.
+        # The deltas stay buffered and the next flush retries them.
+        try:
+            await self.flush()
+        except Exception as e:
+            self.bot.logger.error(f'Could not flush levels: {e}')
+
+    def _buffer(self, user, messages, xp):
+        delta = self._pending.setdefault(user, [0, 0])
+        delta[0] += messages
+        delta[1] += xp
+        self._pending_events += 1
+        # >= so that events put back by a failed flush still trigger the next one
+        if self._pending_events >= self.flush_threshold and (self._flushing is None or self._flushing.done()):
+            self._flushing = self.bot.loop.create_task(self._flushQuietly())
+
+    async def flush(self):
+        """
+        Writes every buffered message/XP delta in a single transaction.
+        The write sits in a savepoint, so a failure undoes only these rows and
+        puts the deltas back in the buffer without touching other statements on the connection.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            events, self._pending_events = self._pending_events, 0
+            released = False
+            try:
+                await self.pool.execute("SAVEPOINT level_flush;")
+                await self.pool.executemany(f"INSERT INTO {self.table} VALUES (?,?,?) "
+                                            f"ON CONFLICT (USERID) DO UPDATE SET MESSAGES = MESSAGES + excluded.MESSAGES, XP = XP + excluded.XP;",
+                                            [(user, messages, xp) for user, (messages, xp) in pending.items()])
+                await self.pool.execute("RELEASE level_flush;")
+                released = True
+                await self.pool.commit()
+            except Exception:
+                # Once released, the rows belong to the open transaction and the next commit writes them.
+                if not released:
+                    try:
+                        await self.pool.execute("ROLLBACK TO level_flush;")
+                        await self.pool.execute("RELEASE level_flush;")
+                    except Exception:
+                        pass
+                    for user, (messages, xp) in pending.items():
+                        delta = self._pending.setdefault(user, [0, 0])
+                        delta[0] += messages
+                        delta[1] += xp
+                    self._pending_events += events
+                raise
 
     async def get(self, user):
+        await self.flush()
         async with self.pool.execute(f"SELECT * FROM {self.table} WHERE USERID = ?;", (user,)) as cursor:
             async for row in cursor:
                 return LevelUser(row)
         return None
 
     async def update(self, user, xp):
-        async with self.pool.execute(f"SELECT * FROM {self.table} WHERE USERID = ?;", (user,)) as cursor:
-            async for _ in cursor:
-                await self.pool.execute(f"UPDATE {self.table} SET XP = XP + ?, MESSAGES = MESSAGES WHERE USERID = ?;", (xp, user))
-                await self.pool.commit()
-                return
-        await self.pool.execute(f"INSERT INTO {self.table} VALUES (?,?,?);", (user, 1, xp))
-        await self.pool.commit()
+        self._buffer(user, 0, xp)
 
     async def addMessage(self, user):
-        async with self.pool.execute(f"SELECT * FROM {self.table} WHERE USERID = ?;", (user,)) as cursor:
-            async for _ in cursor:
-                await self.pool.execute(f"UPDATE {self.table} SET MESSAGES = MESSAGES + 1 WHERE USERID = ?;", (user,))
-                await self.pool.commit()
-                return
-        await self.pool.execute(f"INSERT INTO {self.table} VALUES (?,?,?);", (user, 1, 0))
-        await self.pool.commit()
+        self._buffer(user, 1, 0)
 
     async def getAll(self):
+        await self.flush()
         users = []
         async with self.pool.execute(f"SELECT * FROM {self.table};") as cursor:
             async for row in cursor:
                 users.append(LevelUser(row))
         return users
 
+    async def count(self):
+        await self.flush()
+        async with self.pool.execute(f"SELECT COUNT(*) FROM {self.table};") as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    async def getRank(self, user: LevelUser):
+        """
+        Returns the user's 1-based leaderboard position, ordered by XP and then user ID.
+        Both counts are range scans over IDX_LEVELS_XP.
+        """
+        await self.flush()
+        async with self.pool.execute(f"SELECT (SELECT COUNT(*) FROM {self.table} WHERE XP > ?1) + "
+                                     f"(SELECT COUNT(*) FROM {self.table} WHERE XP = ?1 AND USERID < ?2) + 1;",
+                                     (user.xp, user.user)) as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    async def getPage(self, offset, limit):
+        await self.flush()
+        users = []
+        async with self.pool.execute(f"SELECT * FROM {self.table} ORDER BY XP DESC, USERID LIMIT ? OFFSET ?;",
+                                     (limit, offset)) as cursor:
+            async for row in cursor:
+                users.append(LevelUser(row))
+        return users
+
 class Roles:
     table = 'ROLES'
     init_query = "CREATE TABLE IF NOT EXISTS {} (" \
-                 "ROLEID INT NOT NULL," \
+                 "ROLEID INTEGER NOT NULL PRIMARY KEY," \
                  "NAME TEXT NOT NULL," \
                  "DESCRIPTION TEXT NOT NULL" \
                  ");"
@@ -350,7 +488,7 @@ class Roles:
         self.channel = self.bot._config['roles']['channel']
         with open('data/message.txt', 'r') as f:
             self.message = int(f.read())
-        bot.loop.create_task(self.init())
+        self._menu = None  # (select, embed), rebuilt after add/remove
 
     async def init(self):
         await self.pool.execute(self.init_query.format(self.table))
@@ -368,6 +506,7 @@ class Roles:
             raise AtlasException('Role already exists.')
         await self.pool.execute(f"INSERT INTO {self.table} VALUES (?,?,?);", (role, name, description))
         await self.pool.commit()
+        self._menu = None
         return await self.getAll()
 
     async def get(self, role):
@@ -377,6 +516,14 @@ class Roles:
         raise AtlasException("That reaction role doesn't exist.")
 
     async def getAll(self):
+        """
+        Returns the role menu's select and embed, built once and cached until a role is added or removed.
+        """
+        if self._menu is None:
+            self._menu = await self._buildMenu()
+        return self._menu
+
+    async def _buildMenu(self):
         options = []
         embed = Embed(
             title="Roles",
@@ -405,36 +552,68 @@ class Roles:
         await self.get(role)
         await self.pool.execute(f"DELETE FROM {self.table} WHERE ROLEID = ?;", (role,))
         await self.pool.commit()
+        self._menu = None
         return await self.getAll()
     
 class Tickets:
     table = 'TICKETS'
     init_query = "CREATE TABLE IF NOT EXISTS {} (" \
-                 "ID INT NOT NULL," \
+                 "ID INTEGER NOT NULL PRIMARY KEY," \
                  "USERID INT NOT NULL," \
-                 "CHANNELID INT NOT NULL," \
+                 "CHANNELID INT NOT NULL UNIQUE," \
                  "STATUS INT NOT NULL," \
-                 "CREATED INT NOT NULL" \
+                 "CREATED INT NOT NULL," \
+                 "LOGGED BOOLEAN NOT NULL DEFAULT FALSE" \
                  ");"
+    # append-only log of everything that happens in a ticket channel, replayed into the transcript on close
+    messages_table = 'TICKET_MESSAGES'
+    messages_init_query = "CREATE TABLE IF NOT EXISTS {} (" \
+                          "ID INTEGER PRIMARY KEY," \
+                          "CHANNELID INT NOT NULL," \
+                          "MESSAGEID INT NOT NULL," \
+                          "EVENT INT NOT NULL," \
+                          "DATA TEXT" \
+                          ");"
+    timeout = 60*10  # unanswered tickets are deleted after 10 minutes
+    log_threshold = 100  # buffered log rows before an early flush
+    """
+    Message Events:
+    0 - Sent, DATA is the message JSON.
+    1 - Edited, DATA is the new message JSON.
+    2 - Deleted, DATA is NULL.
+    """
 
     def __init__(self, bot, pool):
         self.bot = bot
         self.pool: aiosqlite.Connection = pool
-        bot.loop.create_task(self.init())
+        self.ids = IDSequence(pool, self.table)
+        self.channels = set()  # channel IDs of open tickets
+        self._log: List[Tuple[int, int, int, str]] = []  # buffered TICKET_MESSAGES rows
+        self._log_lock = asyncio.Lock()
+        self._flushing: Optional[asyncio.Task] = None  # early flush started by logMessage
+        bot.loop.create_task(self.loadJobs())
+        self.flushLogBuffer.start()
 
     async def init(self):
         await self.pool.execute(self.init_query.format(self.table))
+        await self.pool.execute(self.messages_init_query.format(self.messages_table))
         await self.pool.commit()
+        async with self.pool.execute(f"SELECT CHANNELID FROM {self.table};") as cursor:
+            async for row in cursor:
+                self.channels.add(row[0])
 
     async def close(self):
-        pass
+        self.flushLogBuffer.cancel()
+        await self.flushLog()
 
-    async def getNewID(self):
-        _id = -1
-        async with self.pool.execute(f"SELECT * from {self.table};") as cursor:
+    async def loadJobs(self):
+        await self.bot.wait_until_ready()
+        async with self.pool.execute(f"SELECT ID, CREATED FROM {self.table} WHERE STATUS = 0;") as cursor:
             async for row in cursor:
-                _id = max(row[0], _id)
-        return _id + 1
+                self.bot.scheduler.schedule(('ticket_timeout', row[0]), row[1] + self.timeout)
+
+    async def getNewID(self):
+        return await self.ids.next()
 
     async def get(self, id):
         async with self.pool.execute(f"SELECT * FROM {self.table} WHERE ID = ?;", (id,)) as cursor:
@@ -455,20 +634,100 @@ class Tickets:
                 return Ticket(row)
         raise AtlasException("That ticket doesn't exist.")
 
-    async def add(self, user, channel):
-        _id = await self.getNewID()
-        await self.pool.execute(f"INSERT INTO {self.table} VALUES (?,?,?,?,?);", (_id, user, channel, 0, time()))
+    async def add(self, user, channel, _id=None):
+        if _id is None:
+            _id = await self.getNewID()
+        created = time()
+        await self.pool.execute(f"INSERT INTO {self.table} VALUES (?,?,?,?,?,?);", (_id, user, channel, 0, created, True))
         await self.pool.commit()
+        self.channels.add(channel)
+        self.bot.scheduler.schedule(('ticket_timeout', _id), created + self.timeout)
 
     async def remove(self, id):
-        await self.get(id)
-        await self.pool.execute(f"DELETE FROM {self.table} WHERE ID = ?;", (id,))
-        await self.pool.commit()
+        ticket = await self.get(id)
+        async with self._log_lock:
+            # logMessage drops rows for channels that aren't open, so none are buffered after this
+            self.channels.discard(ticket.channel)
+            self._log = [row for row in self._log if row[0] != ticket.channel]
+            await self.pool.execute(f"DELETE FROM {self.table} WHERE ID = ?;", (id,))
+            await self.pool.execute(f"DELETE FROM {self.messages_table} WHERE CHANNELID = ?;", (ticket.channel,))
+            await self.pool.commit()
+        self.bot.scheduler.cancel(('ticket_timeout', id))
+
+    @tasks.loop(seconds=5)
+    async def flushLogBuffer(self):
+        await self._flushLogQuietly()
+
+    async def _flushLogQuietly(self):
+        try:
+            await self.flushLog()
+        except Exception as e:
+            self.bot.logger.error(f'Could not flush ticket messages: {e}')
+
+    async def logMessage(self, channel, message, event, data=None):
+        """
+        Buffers a log row. Rows are written in batches like level deltas, so a ticket
+        channel costs one commit every few seconds rather than one per message.
+        A crash can lose the last few seconds of log, which only affects the transcript.
+        """
+        if channel not in self.channels:
+            return
+        self._log.append((channel, message, event, json.dumps(data) if data is not None else None))
+        if len(self._log) >= self.log_threshold and (self._flushing is None or self._flushing.done()):
+            self._flushing = self.bot.loop.create_task(self._flushLogQuietly())
+
+    async def flushLog(self):
+        """
+        Writes every buffered log row in one transaction, restoring them to the buffer if the write fails.
+        """
+        async with self._log_lock:
+            if not self._log:
+                return
+            rows, self._log = self._log, []
+            released = False
+            try:
+                await self.pool.execute("SAVEPOINT ticket_log;")
+                await self.pool.executemany(f"INSERT INTO {self.messages_table} (CHANNELID, MESSAGEID, EVENT, DATA) VALUES (?,?,?,?);", rows)
+                await self.pool.execute("RELEASE ticket_log;")
+                released = True
+                await self.pool.commit()
+            except Exception:
+                # Once released, the rows belong to the open transaction and the next commit writes them.
+                if not released:
+                    try:
+                        await self.pool.execute("ROLLBACK TO ticket_log;")
+                        await self.pool.execute("RELEASE ticket_log;")
+                    except Exception:
+                        pass
+                    self._log[:0] = rows
+                raise
+
+    async def getMessages(self, channel):
+        """
+        Yields the latest JSON of every message logged in `channel`, oldest first.
+        Messages that were deleted are included with `"deleted": true`.
+        """
+        await self.flushLog()
+        query = f"SELECT (SELECT DATA FROM {self.messages_table} AS l " \
+                f"        WHERE l.CHANNELID = m.CHANNELID AND l.MESSAGEID = m.MESSAGEID AND l.DATA IS NOT NULL " \
+                f"        ORDER BY l.ID DESC LIMIT 1), " \
+                f"MAX(EVENT = 2) " \
+                f"FROM {self.messages_table} AS m WHERE CHANNELID = ? GROUP BY MESSAGEID ORDER BY MESSAGEID;"
+        async with self.pool.execute(query, (channel,)) as cursor:
+            async for data, deleted in cursor:
+                if data is None:
+                    continue  # deleted before it was logged
+                message = json.loads(data)
+                if deleted:
+                    message['deleted'] = True
+                yield message
 
     async def updateState(self, id, state):
         await self.get(id)
         await self.pool.execute(f"UPDATE {self.table} SET STATUS = ? WHERE ID = ?;", (state, id))
         await self.pool.commit()
+        if state != 0:
+            self.bot.scheduler.cancel(('ticket_timeout', id))
 
 class Other:
     table = 'OTHER'
@@ -476,13 +735,13 @@ class Other:
                  "USER1 INT NOT NULL," \
                  "USER2 INT NOT NULL," \
                  "VALUE INT NOT NULL," \
-                 "TYPE INT NOT NULL" \
+                 "TYPE INT NOT NULL," \
+                 "PRIMARY KEY (USER1, USER2, TYPE)" \
                  ");"
 
     def __init__(self, bot, pool):
         self.bot = bot
         self.pool: aiosqlite.Connection = pool
-        bot.loop.create_task(self.init())
 
     async def init(self):
         await self.pool.execute(self.init_query.format(self.table))
@@ -509,7 +768,7 @@ class Other:
 class Birthday:
     table = 'BIRTHDAYS'
     init_query = "CREATE TABLE IF NOT EXISTS {} (" \
-                 "USERID INT NOT NULL," \
+                 "USERID INTEGER NOT NULL PRIMARY KEY," \
                  "MONTH INT NOT NULL," \
                  "DAY INT NOT NULL" \
                  ");"
@@ -517,7 +776,6 @@ class Birthday:
     def __init__(self, bot, pool):
         self.bot = bot
         self.pool: aiosqlite.Connection = pool
-        bot.loop.create_task(self.init())
 
     async def init(self):
         await self.pool.execute(self.init_query.format(self.table))
@@ -558,16 +816,19 @@ class Giveaways:
     table = 'GIVEAWAYS'
     init_query = "CREATE TABLE IF NOT EXISTS {} (" \
                  "CHANNELID INT NOT NULL," \
-                 "MESSAGEID INT NOT NULL," \
+                 "MESSAGEID INTEGER NOT NULL PRIMARY KEY," \
                  "WINNERS INT NOT NULL," \
                  "ENDS INT NOT NULL," \
                  "ENDED BOOLEAN NOT NULL DEFAULT FALSE" \
                  ");"
+    purge_after = 86400  # ended giveaways are forgotten after a day
 
     def __init__(self, bot, pool):
         self.bot = bot
         self.pool: aiosqlite.Connection = pool
-        bot.loop.create_task(self.init())
+        bot.scheduler.register('giveaway_end', self.end)
+        bot.scheduler.register('giveaway_purge', self.purge)
+        bot.loop.create_task(self.loadJobs())
     
     async def init(self):
         await self.pool.execute(self.init_query.format(self.table))
@@ -576,8 +837,17 @@ class Giveaways:
     async def close(self):
         pass
 
+    async def loadJobs(self):
+        await self.bot.wait_until_ready()
+        async with self.pool.execute(f"SELECT MESSAGEID, ENDS, ENDED FROM {self.table};") as cursor:
+            async for row in cursor:
+                if bool(row[2]):
+                    self.bot.scheduler.schedule(('giveaway_purge', row[0]), row[1] + self.purge_after)
+                else:
+                    self.bot.scheduler.schedule(('giveaway_end', row[0]), row[1])
+
     async def create(self, channel, prize, duration, winners, maker):
-        now = datetime.datetime.utcnow()
+        now = datetime.datetime.now(datetime.timezone.utc)
         end = now + datetime.timedelta(seconds=duration)
         embed = Embed(title=prize, description=f"React with :tada: to enter the giveaway!\n"
                                                f"**{winners}** winner{'s' if winners > 1 else ''} will be chosen.\n"
@@ -587,52 +857,156 @@ class Giveaways:
         await message.add_reaction("🎉")
         await self.pool.execute(f"INSERT INTO {self.table} VALUES (?,?,?,?,?);", (channel.id, message.id, winners, end.timestamp(), False))
         await self.pool.commit()
+        self.bot.scheduler.schedule(('giveaway_end', message.id), end.timestamp())
         return message
 
-    async def check(self):
-        now = datetime.datetime.utcnow()
-        async with self.pool.execute(f"SELECT * FROM {self.table}") as cursor:
-            async for row in cursor:
-                if (row[3] + 86400) < now.timestamp() and bool(row[4]):
-                    await self.pool.execute(f"DELETE FROM {self.table} WHERE CHANNELID = ? AND MESSAGEID = ?;", (row[0], row[1]))
-                    await self.pool.commit()
-                elif row[3] < now.timestamp() and not bool(row[4]):
-                    await self.pool.execute(f"UPDATE {self.table} SET ENDED = TRUE WHERE CHANNELID = ? AND MESSAGEID = ?;", (row[0], row[1]))
-                    await self.pool.commit()
-                    channel = self.bot.get_channel(row[0])
-                    try:
-                        message = await channel.fetch_message(row[1])
-                    except discord.NotFound:
-                        await self.pool.execute(f"DELETE FROM {self.table} WHERE CHANNELID = ? AND MESSAGEID = ?;", (row[0], row[1]))
-                        await self.pool.commit()
-                        continue
-                    prize = message.embeds[0].title
-                    winners = row[2]
-                    reacted = []
-                    for reaction in message.reactions:
-                        if reaction.emoji == "🎉":
-                            async for user in reaction.users():
-                                if not user.bot:
-                                    reacted.append(user)
-                    if len(reacted) != 0:
-                        if len(reacted) >= winners:
-                            winners = random.sample(reacted, winners)
-                            await message.reply(f"Congratulations {', '.join([winner.mention for winner in winners])}, you won **{prize}**! :tada:")
-                        else:
-                            winners = reacted
-                            await message.reply(f"Congratulations {', '.join([winner.mention for winner in winners])}, you won **{prize}**! :tada:")
-                        embed = message.embeds[0]
-                        embed.description = f"This giveaway ended <t:{int(now.timestamp())}:R>." \
-                                            f"\nWinners: {', '.join([winner.mention for winner in winners])}"
-                        await message.edit(embed=embed)
-                    else:
-                        embed = message.embeds[0]
-                        embed.description = f"This giveaway ended <t:{int(now.timestamp())}:R>." \
-                                            f"\nWinners: Nobody :slight_frown:"
-                        await message.edit(embed=embed)
-                        await message.reply(f"Nobody won. :slight_frown:")
+    async def purge(self, message_id):
+        await self.pool.execute(f"DELETE FROM {self.table} WHERE MESSAGEID = ?;", (message_id,))
+        await self.pool.commit()
+
+    async def end(self, message_id):
+        async with self.pool.execute(f"SELECT * FROM {self.table} WHERE MESSAGEID = ? AND ENDED = FALSE;", (message_id,)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return
+        now = datetime.datetime.now(datetime.timezone.utc)
+        await self.pool.execute(f"UPDATE {self.table} SET ENDED = TRUE WHERE MESSAGEID = ?;", (message_id,))
+        await self.pool.commit()
+        self.bot.scheduler.schedule(('giveaway_purge', message_id), row[3] + self.purge_after)
+        channel = self.bot.get_channel(row[0])
+        try:
+            message = await channel.fetch_message(row[1])
+        except discord.NotFound:
+            self.bot.scheduler.cancel(('giveaway_purge', message_id))
+            return await self.purge(message_id)
+        prize = message.embeds[0].title
+        winners = row[2]
+        reacted = []
+        for reaction in message.reactions:
+            if reaction.emoji == "🎉":
+                async for user in reaction.users():
+                    if not user.bot:
+                        reacted.append(user)
+        if len(reacted) != 0:
+            if len(reacted) >= winners:
+                winners = random.sample(reacted, winners)
+                await message.reply(f"Congratulations {', '.join([winner.mention for winner in winners])}, you won **{prize}**! :tada:")
+            else:
+                winners = reacted
+                await message.reply(f"Congratulations {', '.join([winner.mention for winner in winners])}, you won **{prize}**! :tada:")
+            embed = message.embeds[0]
+            embed.description = f"This giveaway ended <t:{int(now.timestamp())}:R>." \
+                                f"\nWinners: {', '.join([winner.mention for winner in winners])}"
+            await message.edit(embed=embed)
+        else:
+            embed = message.embeds[0]
+            embed.description = f"This giveaway ended <t:{int(now.timestamp())}:R>." \
+                                f"\nWinners: Nobody :slight_frown:"
+            await message.edit(embed=embed)
+            await message.reply(f"Nobody won. :slight_frown:")
                     
 
+def _rebuild(table, schema, select):
+    # rows that collide on the new constraints are dropped, so order `select` by the row to keep
+    return (
+        f"CREATE TABLE {table}_NEW ({schema});",
+        f"INSERT OR IGNORE INTO {table}_NEW {select};",
+        f"DROP TABLE {table};",
+        f"ALTER TABLE {table}_NEW RENAME TO {table};",
+    )
+
+def _unique_id(table):
+    # keeps the first row for each ID, rows with a duplicate ID get NULL and are renumbered on insert
+    return f"CASE WHEN {table}.rowid = FIRSTROW THEN {table}.ID END AS NEWID"
+
+def _first_rows(table):
+    # the first rowid per ID, computed once so the migration doesn't scan the table for every row
+    return f"LEFT JOIN (SELECT ID AS FIRSTID, MIN(rowid) AS FIRSTROW FROM {table} GROUP BY ID) ON FIRSTID = {table}.ID"
+
+class Migrations:
+    """
+    Versioned schema changes, applied in order by Database.init.
+    The applied version is stored in SQLite's user_version pragma.
+    """
+    migrations = (
+        # 1 - primary keys, unique constraints and lookup indexes
+        (
+            *_rebuild('ACTIONS',
+                      "USERID INT NOT NULL, MODERATOR INT NOT NULL, REASON TEXT NOT NULL, ID INTEGER NOT NULL PRIMARY KEY, "
+                      "TIME INT NOT NULL, EXPIRES INT, ACTION INT NOT NULL, EXPIRED BOOLEAN NOT NULL DEFAULT FALSE",
+                      f"SELECT USERID, MODERATOR, REASON, {_unique_id('ACTIONS')}, TIME, EXPIRES, ACTION, EXPIRED "
+                      f"FROM ACTIONS {_first_rows('ACTIONS')} ORDER BY NEWID IS NULL, ACTIONS.rowid"),
+            *_rebuild('SUGGESTIONS',
+                      "USERID INT NOT NULL, MESSAGEID INT NOT NULL, SUGGESTION TEXT NOT NULL, ID INTEGER NOT NULL PRIMARY KEY, "
+                      "STATUS BOOLEAN NOT NULL DEFAULT FALSE",
+                      f"SELECT USERID, MESSAGEID, SUGGESTION, {_unique_id('SUGGESTIONS')}, STATUS "
+                      f"FROM SUGGESTIONS {_first_rows('SUGGESTIONS')} ORDER BY NEWID IS NULL, SUGGESTIONS.rowid"),
+            *_rebuild('LEVELS',
+                      "USERID INTEGER NOT NULL PRIMARY KEY, MESSAGES INT NOT NULL, XP INT NOT NULL",
+                      "SELECT USERID, SUM(MESSAGES), SUM(XP) FROM LEVELS GROUP BY USERID"),
+            *_rebuild('ROLES',
+                      "ROLEID INTEGER NOT NULL PRIMARY KEY, NAME TEXT NOT NULL, DESCRIPTION TEXT NOT NULL",
+                      "SELECT * FROM ROLES ORDER BY rowid"),
+            *_rebuild('TICKETS',
+                      "ID INTEGER NOT NULL PRIMARY KEY, USERID INT NOT NULL, CHANNELID INT NOT NULL UNIQUE, "
+                      "STATUS INT NOT NULL, CREATED INT NOT NULL",
+                      f"SELECT {_unique_id('TICKETS')}, USERID, CHANNELID, STATUS, CREATED "
+                      f"FROM TICKETS {_first_rows('TICKETS')} ORDER BY NEWID IS NULL, TICKETS.rowid"),
+            *_rebuild('OTHER',
+                      "USER1 INT NOT NULL, USER2 INT NOT NULL, VALUE INT NOT NULL, TYPE INT NOT NULL, PRIMARY KEY (USER1, USER2, TYPE)",
+                      "SELECT * FROM OTHER ORDER BY rowid"),
+            *_rebuild('BIRTHDAYS',
+                      "USERID INTEGER NOT NULL PRIMARY KEY, MONTH INT NOT NULL, DAY INT NOT NULL",
+                      "SELECT * FROM BIRTHDAYS ORDER BY rowid DESC"),
+            *_rebuild('GIVEAWAYS',
+                      "CHANNELID INT NOT NULL, MESSAGEID INTEGER NOT NULL PRIMARY KEY, WINNERS INT NOT NULL, "
+                      "ENDS INT NOT NULL, ENDED BOOLEAN NOT NULL DEFAULT FALSE",
+                      "SELECT * FROM GIVEAWAYS ORDER BY rowid"),
+            "CREATE INDEX IF NOT EXISTS IDX_ACTIONS_USER ON ACTIONS (USERID, ACTION);",
+            "CREATE INDEX IF NOT EXISTS IDX_ACTIONS_EXPIRY ON ACTIONS (EXPIRED, EXPIRES);",
+            "CREATE INDEX IF NOT EXISTS IDX_SUGGESTIONS_USER ON SUGGESTIONS (USERID);",
+            "CREATE INDEX IF NOT EXISTS IDX_TICKETS_USER ON TICKETS (USERID);",
+            "CREATE INDEX IF NOT EXISTS IDX_GIVEAWAYS_ENDS ON GIVEAWAYS (ENDED, ENDS);",
+        ),
+        # 2 - ticket message log lookups
+        (
+            "CREATE INDEX IF NOT EXISTS IDX_TICKET_MESSAGES_CHANNEL ON TICKET_MESSAGES (CHANNELID, MESSAGEID);",
+        ),
+        # 3 - leaderboard order
+        (
+            "CREATE INDEX IF NOT EXISTS IDX_LEVELS_XP ON LEVELS (XP DESC);",
+        ),
+        # 4 - tickets opened before the message log keep building transcripts from the channel history
+        (
+            "ALTER TABLE TICKETS ADD COLUMN LOGGED BOOLEAN NOT NULL DEFAULT FALSE;",
+        ),
+    )
+
+    def __init__(self, bot, pool):
+        self.bot = bot
+        self.pool: aiosqlite.Connection = pool
+
+    async def getVersion(self):
+        async with self.pool.execute("PRAGMA user_version;") as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    async def run(self):
+        version = await self.getVersion()
+        for target, statements in enumerate(self.migrations, start=1):
+            if target <= version:
+                continue
+            await self.pool.execute("BEGIN;")
+            try:
+                for statement in statements:
+                    await self.pool.execute(statement)
+                await self.pool.execute(f"PRAGMA user_version = {target};")
+                await self.pool.commit()
+            except Exception:
+                await self.pool.rollback()
+                raise
+            self.bot.logger.info(f'Database migrated to schema version {target}.')
+
 class Database:
     def __init__(self, bot):
         self.bot = bot
@@ -649,10 +1023,12 @@ class Database:
         self.other = Other(self.bot, self.pool)
         self.birthday = Birthday(self.bot, self.pool)
         self.giveaway = Giveaways(self.bot, self.pool)
+        self.migrations = Migrations(self.bot, self.pool)
+        for table in (self.mod, self.suggest, self.level, self.roles, self.tickets, self.other, self.birthday, self.giveaway):
+            await table.init()
+        await self.migrations.run()
 
     async def close(self):
-        await self.pool.commit()
-        await asyncio.wait_for(self.pool.close(), timeout=5)
         await self.mod.close()
         await self.suggest.close()
         await self.level.close()
@@ -661,3 +1037,5 @@ class Database:
         await self.other.close()
         await self.birthday.close()
         await self.giveaway.close()
+        await self.pool.commit()
+        await asyncio.wait_for(self.pool.close(), timeout=5)
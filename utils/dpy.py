@@ -2,6 +2,8 @@ import datetime
 import discord
 import json
 import io
+import shutil
+import tempfile
 
 def embed_to_json(embed: discord.Embed):
     embed_json = {}
@@ -88,48 +90,102 @@ def message_to_json(message: discord.Message):
     message_json["attachments"] = [attachment_to_json(attachment) for attachment in message.attachments]
     return message_json
 
-async def save_channel(channel: discord.TextChannel):
-    guild: discord.Guild = channel.guild
-    _messages = []
-    _user_info = {} # {"text": # of messages}
+class TranscriptWriter:
+    """
+    Builds a ticket transcript one message at a time.
+
+    Each message is serialized into a spooled temporary file as it is added,
+    and only the per-user message counts stay in memory. `finish` writes the
+    header, copies the messages in behind it in chunks and leaves `file`
+    positioned at the start, ready to upload.
+    """
+
+    max_memory = 1024 * 1024  # bytes kept in memory before spilling to disk
+    chunk_size = 64 * 1024
+
+    def __init__(self, channel: discord.TextChannel):
+        self.channel = channel
+        self.count = 0
+        self.users = {}  # {"user (id)": # of messages}
+        self.file = None
+        self._body = tempfile.SpooledTemporaryFile(max_size=self.max_memory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, message: dict):
+        self._body.write(b', ' if self.count else b'[')
+        self._body.write(json.dumps(message).encode('utf-8'))
+        self.count += 1
+        key = f"{message['username']}#{message['tag']} ({message['user_id']})"
+        self.users[key] = self.users.get(key, 0) + 1
+
+    def finish(self):
+        guild: discord.Guild = self.channel.guild
+        user_info = ""
+        for key, value in self.users.items():
+            user_info += f"    {value} - {key}\n"
+        _channel = {
+            "name": self.channel.name,
+            "id": str(self.channel.id),
+        }
+        _guild = {
+            "name": guild.name,
+            "id": str(guild.id),
+            "icon": str(guild.icon_url).split('/')[-1].split('?')[0].split('.')[0],
+        }
+        header = f"<Server-Info>\n" \
+                 f"    Server: {guild.name} ({guild.id})\n" \
+                 f"    Channel: {self.channel.name} ({self.channel.id})\n" \
+                 f"    Messages: {self.count}\n" \
+                 f"\n" \
+                 f"<User-Info>\n" \
+                 f"{user_info}" \
+                 f"\n" \
+                 f"<Base-Transcript>\n" \
+                 f"    <script src=\"https://tickettool.xyz/transcript/transcript.bundle.min.obv.js\">\n" \
+                 f"    </script>\n" \
+                 f"    <script type=\"text/javascript\">\n" \
+                 f"        let channel = {json.dumps(_channel)};\n" \
+                 f"        let guild = {json.dumps(_guild)};\n" \
+                 f"        let messages = "
+        footer = f";\n" \
+                 f"        window.Convert(messages, channel, guild);\n" \
+                 f"    </script>"
+        self._body.write(b']' if self.count else b'[]')
+        self._body.seek(0)
+        self.file = tempfile.SpooledTemporaryFile(max_size=self.max_memory)
+        self.file.write(header.encode('utf-8'))
+        shutil.copyfileobj(self._body, self.file, self.chunk_size)
+        self.file.write(footer.encode('utf-8'))
+        self.file.seek(0)
+        self._body.close()
+        return self.file
+
+    @property
+    def fp(self):
+        """
+        The file behind `file`, an in-memory or on-disk binary file.
+        SpooledTemporaryFile is only an io.IOBase on Python 3.11+, so discord.File
+        and aiohttp would try to open it as a path on older versions.
+        """
+        return self.file._file
+
+    def close(self):
+        self._body.close()
+        if self.file is not None:
+            self.file.close()
+
+async def save_channel(channel: discord.TextChannel) -> TranscriptWriter:
+    writer = TranscriptWriter(channel)
     async with channel.typing():
         async for message in channel.history(limit=None, oldest_first=True):
-            message: discord.Message
-            _messages.append(message_to_json(message))
-            if f"{message.author} ({message.author.id})" in _user_info:
-                _user_info[f"{message.author} ({message.author.id})"] += 1
-            else:
-                _user_info[f"{message.author} ({message.author.id})"] = 1
-    user_info = ""
-    for key, value in _user_info.items():
-        user_info += f"    {value} - {key}\n"
-    _channel = {
-        "name": channel.name,
-        "id": str(channel.id),
-    }
-    _guild = {
-        "name": guild.name,
-        "id": str(guild.id),
-        "icon": str(guild.icon_url).split('/')[-1].split('?')[0].split('.')[0],
-    }
-    html = f"<Server-Info>\n" \
-            f"    Server: {guild.name} ({guild.id})\n" \
-            f"    Channel: {channel.name} ({channel.id})\n" \
-            f"    Messages: {len(_messages)}\n" \
-            f"\n" \
-            f"<User-Info>\n" \
-            f"{user_info}" \
-            f"\n" \
-            f"<Base-Transcript>\n" \
-            f"    <script src=\"https://tickettool.xyz/transcript/transcript.bundle.min.obv.js\">\n" \
-            f"    </script>\n" \
-            f"    <script type=\"text/javascript\">\n" \
-            f"        let channel = {json.dumps(_channel)};\n" \
-            f"        let guild = {json.dumps(_guild)};\n" \
-            f"        let messages = {json.dumps(_messages)};\n" \
-            f"        window.Convert(messages, channel, guild);\n" \
-            f"    </script>"
-    return html
+            writer.add(message_to_json(message))
+    writer.finish()
+    return writer
 
 class Embed(discord.Embed):
     def __init__(self, **kwargs):
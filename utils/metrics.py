@@ -0,0 +1,137 @@
+import asyncio
+import bisect
+import time
+from collections import deque
+from typing import Dict, Tuple
+
+from aiohttp import web
+
+
+class Histogram:
+    """
+    Latency histogram for one handler.
+
+    Keeps cumulative bucket counts for Prometheus, plus the last `window`
+    samples so percentiles reflect recent behaviour rather than all-time totals.
+    """
+
+    buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, window: int = 1024):
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        samples = sorted(self.recent)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    Handler latency and event loop lag for the bot.
+
+    `Bot` reports every listener and slash command through `observe`. While
+    running, a sampler sleeps for `lag_interval` seconds and records how late
+    it wakes up; that delay is time the loop spent stuck in some callback.
+    If `port` is set, `render()` is served as Prometheus text on
+    http://host:port/metrics.
+    """
+
+    lag_interval = 0.5
+
+    def __init__(self, bot, *, host: str = '127.0.0.1', port: int = None):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.handlers: Dict[Tuple[str, str], Histogram] = {}  # {(kind, name): Histogram}
+        self.loop_lag = Histogram()
+        self._task = None
+        self._runner = None
+
+    def observe(self, kind: str, name: str, seconds: float):
+        histogram = self.handlers.get((kind, name))
+        if histogram is None:
+            histogram = self.handlers[(kind, name)] = Histogram()
+        histogram.observe(seconds)
+
+    def slowest(self, limit: int = 10, q: float = 0.99):
+        """
+        Returns the `limit` handlers with the highest recent `q` percentile.
+        """
+        return sorted(self.handlers.items(), key=lambda item: item[1].percentile(q), reverse=True)[:limit]
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._sample_lag())
+        if self.port is not None and self._runner is None:
+            app = web.Application()
+            app.router.add_get('/metrics', self._serve)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            try:
+                await web.TCPSite(self._runner, self.host, self.port).start()
+            except OSError as e:
+                self.bot.logger.error(f'Could not serve metrics on {self.host}:{self.port}: {e}')
+                await self._runner.cleanup()
+                self._runner = None
+                return
+            self.bot.logger.info(f'Serving metrics on http://{self.host}:{self.port}/metrics')
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _sample_lag(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            self.loop_lag.observe(max(0.0, time.perf_counter() - start - self.lag_interval))
+
+    async def _serve(self, request):
+        return web.Response(text=self.render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    @staticmethod
+    def _histogram_lines(metric: str, histogram: Histogram, labels: str = ''):
+        sep = ',' if labels else ''
+        for bound, total in histogram.cumulative():
+            yield f'{metric}_bucket{{{labels}{sep}le="{bound}"}} {total}'
+        suffix = f'{{{labels}}}' if labels else ''
+        yield f'{metric}_sum{suffix} {histogram.sum}'
+        yield f'{metric}_count{suffix} {histogram.count}'
+
+    def render(self) -> str:
+        lines = [
+            '# HELP bentinel_event_loop_lag_seconds How late the event loop woke a sleeping task.',
+            '# TYPE bentinel_event_loop_lag_seconds histogram',
+            *self._histogram_lines('bentinel_event_loop_lag_seconds', self.loop_lag),
+            '# HELP bentinel_handler_seconds Time spent in event listeners and slash commands.',
+            '# TYPE bentinel_handler_seconds histogram',
+        ]
+        for (kind, name), histogram in sorted(self.handlers.items()):
+            labels = f'kind="{kind}",handler="{_escape(name)}"'
+            lines.extend(self._histogram_lines('bentinel_handler_seconds', histogram, labels))
+        return '\n'.join(lines) + '\n'
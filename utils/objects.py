@@ -37,4 +37,5 @@ class Ticket(object):
         self.user = row[1]
         self.channel = row[2]
         self.state = row[3]
-        self.created_at = row[4]
\ No newline at end of file
+        self.created_at = row[4]
+        self.logged = bool(row[5])
\ No newline at end of file
@@ -1,7 +1,9 @@
 """ Paginator """
 import asyncio
+from collections import OrderedDict
 from datetime import datetime
-from typing import List
+from time import time
+from typing import Callable, Dict, List, Optional, Union
 
 import discord
 from discord.ext import commands
@@ -10,166 +12,249 @@ from discord_slash.utils.manage_components import create_button as Button, creat
 from discord_slash import ComponentContext, SlashContext
 
 from utils.dpy import Embed
+from utils.scheduler import DeadlineScheduler
 
 TimeoutButton = Button(label="Menu timed out.", style=ButtonStyle.red, disabled=True)
 ClosedButton = Button(label="Menu closed.", style=ButtonStyle.red, disabled=True)
 
+class PageSource:
+    """
+    Supplies an EmbedPaginator's pages on demand.
+
+    `get_max_pages` may be an estimate. If `get_page` returns None, the index
+    is past the end and the paginator lowers its page count to match.
+    A source with a `key` of `(name, *args)` is written into the buttons' custom IDs.
+    After a restart, the factory registered under `name` with the ComponentRouter
+    can rebuild it from `args`.
+    """
+    key = None
+
+    def get_max_pages(self) -> int:
+        raise NotImplementedError
+
+    async def get_page(self, index: int) -> Optional[Embed]:
+        raise NotImplementedError
+
+
+class ListPageSource(PageSource):
+    """ Pages that were built up front """
+
+    def __init__(self, embeds: List[Embed]):
+        self.embeds = embeds
+
+    def get_max_pages(self):
+        return len(self.embeds)
+
+    async def get_page(self, index):
+        if index >= len(self.embeds):
+            return None
+        return self.embeds[index]
+
+
 class EmbedPaginator:
-    def __init__(self, ctx: SlashContext, embeds: List[Embed], *, footer: str = ''):
+    """
+    Pages through a PageSource with buttons.
+
+    The paginator does not listen for clicks itself. `run` sends the first page
+    and hands the message to the bot's ComponentRouter, which calls `update`.
+    Each button's custom ID carries the page it leads to, the owner and the
+    source key.
+    """
+    cache_size = 5  # rendered pages kept for going back and forth
+
+    def __init__(self, ctx: Union[SlashContext, ComponentContext], source: Union[PageSource, List[Embed]], *,
+                 footer: str = '', owner: int = None):
+        if not isinstance(source, PageSource):
+            source = ListPageSource(source)
         self.page = 0
-        self.embeds = embeds
+        self.source = source
+        self.pages = max(source.get_max_pages(), 1)
+        self._cache = OrderedDict()
         self.ctx = ctx
-        self.bot = None
+        self.bot = ctx.bot
+        self.owner = owner if owner is not None else ctx.author.id
         self.ran = None
         self.footer = footer + ' ' if footer != '' else ''
-        self.buttons = [
-            ActionRow(
-                Button(custom_id='first', style=ButtonStyle.blue, disabled=False, emoji='⏪'),
-                Button(custom_id='back', style=ButtonStyle.blue, disabled=False, emoji='◀'),
-                Button(custom_id='stop', style=ButtonStyle.blue, disabled=False, emoji='⏹'),
-                Button(custom_id='next', style=ButtonStyle.blue, disabled=False, emoji='▶'),
-                Button(custom_id='last', style=ButtonStyle.blue, disabled=False, emoji='⏩'),
-            ),
-            ActionRow(
-                Button(custom_id='selPage', style=ButtonStyle.blue, disabled=False, emoji='🔢')
-            )
-        ]
-        self.no_left = [
-            ActionRow(
-                Button(custom_id='first', style=ButtonStyle.blue, disabled=True, emoji='⏪'),
-                Button(custom_id='back', style=ButtonStyle.blue, disabled=True, emoji='◀'),
-                Button(custom_id='stop', style=ButtonStyle.blue, disabled=False, emoji='⏹'),
-                Button(custom_id='next', style=ButtonStyle.blue, disabled=False, emoji='▶'),
-                Button(custom_id='last', style=ButtonStyle.blue, disabled=False, emoji='⏩'),
-            ),
-            ActionRow(
-                Button(custom_id='selPage', style=ButtonStyle.blue, disabled=False, emoji='🔢')
-            )
-        ]
-        self.no_right = [
-            ActionRow(
-                Button(custom_id='first', style=ButtonStyle.blue, disabled=False, emoji='⏪'),
-                Button(custom_id='back', style=ButtonStyle.blue, disabled=False, emoji='◀'),
-                Button(custom_id='stop', style=ButtonStyle.blue, disabled=False, emoji='⏹'),
-                Button(custom_id='next', style=ButtonStyle.blue, disabled=True, emoji='▶'),
-                Button(custom_id='last', style=ButtonStyle.blue, disabled=True, emoji='⏩'),
-            ),
-            ActionRow(
-                Button(custom_id='selPage', style=ButtonStyle.blue, disabled=False, emoji='🔢')
-            )
-        ]
-        self.disabled_buttons = [
+        self.message = None
+
+    def _custom_id(self, action: str, target: int) -> str:
+        return ':'.join(map(str, (ComponentRouter.prefix, action, target, self.owner, *(self.source.key or ()))))
+
+    def components(self, *, disabled: bool = False):
+        first, last = self.page <= 0, self.page >= self.pages - 1
+        return [
             ActionRow(
-                Button(custom_id='first', style=ButtonStyle.blue, disabled=True, emoji='⏪'),
-                Button(custom_id='back', style=ButtonStyle.blue, disabled=True, emoji='◀'),
-                Button(custom_id='stop', style=ButtonStyle.blue, disabled=True, emoji='⏹'),
-                Button(custom_id='next', style=ButtonStyle.blue, disabled=True, emoji='▶'),
-                Button(custom_id='last', style=ButtonStyle.blue, disabled=True, emoji='⏩'),
+                Button(custom_id=self._custom_id('first', 0), style=ButtonStyle.blue, disabled=disabled or first, emoji='⏪'),
+                Button(custom_id=self._custom_id('back', self.page - 1), style=ButtonStyle.blue, disabled=disabled or first, emoji='◀'),
+                Button(custom_id=self._custom_id('stop', self.page), style=ButtonStyle.blue, disabled=disabled, emoji='⏹'),
+                Button(custom_id=self._custom_id('next', self.page + 1), style=ButtonStyle.blue, disabled=disabled or last, emoji='▶'),
+                Button(custom_id=self._custom_id('last', self.pages - 1), style=ButtonStyle.blue, disabled=disabled or last, emoji='⏩'),
             ),
             ActionRow(
-                Button(custom_id='selPage', style=ButtonStyle.blue, disabled=True, emoji='🔢')
+                Button(custom_id=self._custom_id('selPage', self.page), style=ButtonStyle.blue, disabled=disabled, emoji='🔢')
             )
         ]
-        self.running = False
-        self.message = None
-        self.in_help = False
 
-    async def listen(self):
-        while self.running:
-            try:
-                res = await self.bot.wait_for("component", check=self.check, timeout=60)
-            except asyncio.TimeoutError:
-                if self.running:
-                    self.running = False
-                    await self.message.edit(components=[ActionRow(TimeoutButton)])
-                return
-            asyncio.create_task(self.update(res))
-    
-    async def update(self, res: ComponentContext):
-        if res.author.id != self.ctx.author.id:
+    async def update(self, res: ComponentContext, action: str, target: int):
+        if res.author.id != self.owner:
             return await res.send(content="This isn't your paginator!", hidden=True)
         try:
-            if not self.in_help:
-                if res.custom_id == 'first':
-                    self.page = 0
-                elif res.custom_id == 'back':
-                    self.page -= 1
-                    if self.page < 0:
-                        self.page = 0
-                elif res.custom_id == 'stop':
-                    self.running = False
-                    await res.edit_origin(components=[ActionRow(ClosedButton)])
-                    return
-                elif res.custom_id == 'next':
-                    self.page += 1
-                    if self.page > len(self.embeds)-1:
-                        self.page = len(self.embeds)-1
-                elif res.custom_id == 'last':
-                    self.page = len(self.embeds)-1
-                elif res.custom_id == 'selPage':
-                    await res.edit_origin(components=self.disabled_buttons)
-                    msg = await self.ctx.send(f"{self.ctx.author.mention}, What page would you like to go to?")
-                    try:
-                        _in = await self.bot.wait_for('message', check=lambda m: m.author.id == self.ctx.author.id and m.channel.id == self.ctx.channel.id, timeout=60)
-                    except asyncio.TimeoutError:
-                        await self.message.edit(components=self.buttons)
-                        return await msg.delete(delay=0.1)
-                    await msg.delete(delay=0.1)
-                    try:
-                        page = int(_in.content)
-                    except ValueError:
-                        await self.message.edit(components=self.buttons)
-                        return await _in.delete(delay=0.1)
-                    if page > len(self.embeds):
-                        page = len(self.embeds)
-                    if page < 1:
-                        page = 1
-                    self.page = page - 1
-                    await _in.delete(delay=0.1)
-                    self.embeds[self.page].set_footer(text=f"{self.footer}Page "
-                                                        f"{self.page + 1}/{len(self.embeds)}")
-                    self.embeds[self.page].timestamp = self.ran
-                    await self.message.edit(embed=self.embeds[self.page], components=self.buttons)
-                    return
-                else:
-                    return
-            self.in_help = False
-            self.embeds[self.page].set_footer(text=f"{self.footer}Page "
-                                                        f"{self.page + 1}/{len(self.embeds)}")
-            self.embeds[self.page].timestamp = self.ran
-            if self.page >= len(self.embeds)-1:
-                await res.edit_origin(embed=self.embeds[self.page], components=self.no_right)
-            elif self.page <= 0:
-                await res.edit_origin(embed=self.embeds[self.page], components=self.no_left)
-            else:
-                await res.edit_origin(embed=self.embeds[self.page], components=self.buttons)
+            if action == 'stop':
+                self.bot.components.remove(self.message.id)
+                await res.edit_origin(components=[ActionRow(ClosedButton)])
+                return
+            if action == 'selPage':
+                await res.edit_origin(components=self.components(disabled=True))
+                msg = await self.ctx.send(f"{res.author.mention}, What page would you like to go to?")
+                try:
+                    _in = await self.bot.wait_for('message', check=lambda m: m.author.id == self.owner and m.channel.id == res.channel.id, timeout=60)
+                except asyncio.TimeoutError:
+                    await self.message.edit(components=self.components())
+                    return await msg.delete(delay=0.1)
+                await msg.delete(delay=0.1)
+                try:
+                    page = int(_in.content)
+                except ValueError:
+                    await self.message.edit(components=self.components())
+                    return await _in.delete(delay=0.1)
+                await _in.delete(delay=0.1)
+                self.page = min(max(page, 1), self.pages) - 1
+                embed = await self.get_page(self.page)
+                await self.message.edit(embed=embed, components=self.components())
+                return
+            if action not in ('first', 'back', 'next', 'last'):
+                return
+            self.page = min(max(target, 0), self.pages - 1)
+            embed = await self.get_page(self.page)
+            await res.edit_origin(embed=embed, components=self.components())
         except discord.NotFound:
+            self.bot.components.remove(self.message.id)
             try:
-                self.running = False
                 await self.message.edit(components=[])
             except discord.HTTPException:
                 pass
 
-    def check(self, res: ComponentContext):
-        return res.origin_message_id == self.message.id and res.custom_id in ('last', 'back', 'stop', 'next', 'first', 'selPage') and res.channel.id == self.message.channel.id
+    async def expire(self):
+        try:
+            await self.message.edit(components=[ActionRow(TimeoutButton)])
+        except discord.HTTPException:
+            pass
+
+    async def get_page(self, index: int) -> Embed:
+        """
+        Renders page `index` through the source, keeping the last few in an LRU.
+        Moves `self.page` back if the source's page count was an overestimate.
+        """
+        embed = self._cache.get(index)
+        if embed is not None:
+            self._cache.move_to_end(index)
+        else:
+            embed = await self.source.get_page(index)
+            if embed is None:
+                if index == 0:
+                    embed = Embed(description="Nothing to show.")
+                else:
+                    self.pages = index
+                    self.page = index - 1
+                    return await self.get_page(self.page)
+            self._cache[index] = embed
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        embed.set_footer(text=f"{self.footer}Page {index + 1}/{self.pages}")
+        embed.timestamp = self.ran
+        return embed
 
     async def send_initial(self):
-        self.embeds[self.page].set_footer(text=f"{self.footer}Page {self.page + 1}/{len(self.embeds)}")
-        self.embeds[self.page].timestamp = self.ran
-        self.message = await self.ctx.send(embed=self.embeds[self.page], components=self.no_left)
+        embed = await self.get_page(self.page)
+        self.message = await self.ctx.send(embed=embed, components=self.components())
 
     async def run(self):
         self.ran = datetime.utcnow()
-        if len(self.embeds) == 1:
-            self.embeds[self.page].set_footer(text=f"{self.footer}Page {self.page + 1}/{len(self.embeds)}")
-            self.embeds[self.page].timestamp = self.ran
-            await self.ctx.send(embed=self.embeds[0])
+        if self.pages == 1:
+            embed = await self.get_page(0)
+            await self.ctx.send(embed=embed)
             return
-        self.running = True
-        self.bot = self.ctx.bot
         await self.send_initial()
-        await self.listen()
-        self.running = False
+        self.bot.components.add(self)
+
+
+class ComponentRouter:
+    """
+    Routes paginator button presses to the paginator that owns the message.
+
+    Live paginators are kept in a dict keyed by message ID, so a click is
+    one lookup no matter how many menus are open. Each click pushes the
+    paginator's deadline back `timeout` seconds. A DeadlineScheduler times
+    out idle menus. A click on a message with no live paginator rebuilds
+    one from its custom ID with the factory registered for the source's
+    name. Menus sent before a restart keep working this way.
+    """
+    prefix = 'pg'
+    timeout = 60
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.paginators: Dict[int, EmbedPaginator] = {}  # {message_id: paginator}
+        self.factories: Dict[str, Callable] = {}
+        self.expiries = DeadlineScheduler(bot, self._expire)
+        bot.add_listener(self.on_component)
+
+    def start(self):
+        self.expiries.start()
+
+    def stop(self):
+        self.expiries.stop()
+
+    def register(self, name: str, factory: Callable):
+        """
+        `factory(ctx, owner, *args)` must return a PageSource with the key `(name, *args)`,
+        or None if it can no longer be rebuilt. `owner` is the member the menu belongs to,
+        or None if they have left the guild.
+        """
+        self.factories[name] = factory
+
+    def unregister(self, name: str):
+        self.factories.pop(name, None)
+
+    def add(self, paginator: EmbedPaginator):
+        self.paginators[paginator.message.id] = paginator
+        self.expiries.schedule(paginator.message.id, time() + self.timeout)
+
+    def remove(self, message_id: int):
+        self.paginators.pop(message_id, None)
+        self.expiries.cancel(message_id)
+
+    async def _expire(self, message_id):
+        paginator = self.paginators.pop(message_id, None)
+        if paginator is not None:
+            await paginator.expire()
+
+    async def _restore(self, ctx: ComponentContext, owner: int, key: List[str]) -> Optional[EmbedPaginator]:
+        if not key or key[0] not in self.factories:
+            return None
+        source = await self.factories[key[0]](ctx, ctx.guild.get_member(owner), *key[1:])
+        if source is None:
+            return None
+        paginator = EmbedPaginator(ctx, source, owner=owner)
+        paginator.message = ctx.origin_message
+        paginator.ran = datetime.utcnow()
+        return paginator
+
+    async def on_component(self, ctx: ComponentContext):
+        prefix, _, rest = ctx.custom_id.partition(':')
+        if prefix != self.prefix:
+            return
+        action, target, owner, *key = rest.split(':')
+        paginator = self.paginators.get(ctx.origin_message_id)
+        if paginator is None:
+            if ctx.author.id != int(owner):
+                return await ctx.send(content="This isn't your paginator!", hidden=True)
+            paginator = await self._restore(ctx, int(owner), key)
+            if paginator is None:
+                return await ctx.edit_origin(components=[ActionRow(TimeoutButton)])
+        self.paginators[ctx.origin_message_id] = paginator
+        self.expiries.schedule(ctx.origin_message_id, time() + self.timeout)
+        await paginator.update(ctx, action, int(target))
 
 
 class TextPageSource:
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+
+class OverwriteChange:
+    __slots__ = ('channel', 'overwrite')
+
+    def __init__(self, channel: discord.abc.GuildChannel, overwrite: discord.PermissionOverwrite):
+        self.channel = channel
+        self.overwrite = overwrite
+
+
+class BulkOverwriteEditor:
+    """
+    Applies one target's permission overwrites across many channels at once.
+
+    `plan` works out the new overwrite for each channel and drops the ones that
+    already match, so nothing is sent for them. `apply` runs the rest
+    concurrently. Each channel's overwrite endpoint is a separate rate limit
+    bucket, so up to `concurrency` channels are edited in parallel, and
+    discord.py waits out any 429 on its own bucket. `progress(done, total)` is
+    called at most every `progress_interval` seconds, and once at the end.
+    """
+
+    concurrency = 10
+    progress_interval = 1
+
+    def __init__(self, target: discord.abc.Snowflake, *, reason: str = None):
+        self.target = target
+        self.reason = reason
+
+    def plan(self, channels: Iterable[Tuple[discord.abc.GuildChannel, Dict[str, Optional[bool]]]]) -> List[OverwriteChange]:
+        changes = []
+        for channel, perms in channels:
+            current = channel.overwrites_for(self.target)
+            overwrite = discord.PermissionOverwrite.from_pair(*current.pair())
+            overwrite.update(**perms)
+            if overwrite != current:
+                changes.append(OverwriteChange(channel, overwrite))
+        return changes
+
+    async def apply(self, changes: List[OverwriteChange], *,
+                    after: Callable[[discord.abc.GuildChannel], Awaitable] = None,
+                    progress: Callable[[int, int], Awaitable] = None):
+        """
+        Applies `changes`, awaiting `after(channel)` once each overwrite is in place.
+        Returns the channels whose overwrite failed and the channels where `after` failed,
+        each with their errors. A failing `after` doesn't count against the overwrite.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        failed = []
+        after_failed = []
+        done = 0
+        reported = time.monotonic()
+
+        async def report():
+            # Progress is cosmetic, so a failed update never interrupts the edits.
+            if progress is not None:
+                try:
+                    await progress(done, len(changes))
+                except Exception:
+                    pass
+
+        async def run(change: OverwriteChange):
+            nonlocal done, reported
+            async with semaphore:
+                try:
+                    await change.channel.set_permissions(self.target, overwrite=change.overwrite, reason=self.reason)
+                except Exception as e:
+                    failed.append((change.channel, e))
+                else:
+                    if after is not None:
+                        try:
+                            await after(change.channel)
+                        except Exception as e:
+                            after_failed.append((change.channel, e))
+            done += 1
+            if time.monotonic() - reported >= self.progress_interval:
+                reported = time.monotonic()
+                await report()
+
+        await asyncio.gather(*(run(change) for change in changes))
+        await report()
+        return failed, after_failed
@@ -1,9 +1,74 @@
 import asyncio
+import itertools
+import random
 from async_timeout import timeout
+from collections import deque
+from typing import Iterator, List
 import discord
-from utils.ytdl import YTDLSource
+from utils.ytdl import Track, YTDLSource, extractor
 
 
+class TrackQueue:
+    """A player's upcoming tracks.
+    Appending and taking the next track are O(1), tracks can be read, removed and moved by index,
+    and the total length of the queue is kept up to date as tracks come and go."""
+
+    __slots__ = ('_tracks', '_added', 'duration')
+
+    def __init__(self):
+        self._tracks = deque()
+        self._added = asyncio.Event()
+        self.duration = 0  # seconds, counting only tracks whose duration is known
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __iter__(self) -> Iterator[Track]:
+        return iter(self._tracks)
+
+    def __getitem__(self, index: int) -> Track:
+        return self._tracks[index]
+
+    def empty(self) -> bool:
+        return not self._tracks
+
+    def put(self, track: Track):
+        self._tracks.append(track)
+        self.duration += track.duration or 0
+        self._added.set()
+
+    async def get(self) -> Track:
+        """Takes the next track, waiting for one if the queue is empty."""
+        while not self._tracks:
+            self._added.clear()
+            await self._added.wait()
+        track = self._tracks.popleft()
+        self.duration -= track.duration or 0
+        return track
+
+    def remove(self, index: int) -> Track:
+        track = self._tracks[index]
+        del self._tracks[index]
+        self.duration -= track.duration or 0
+        return track
+
+    def move(self, index: int, to: int):
+        track = self._tracks[index]
+        del self._tracks[index]
+        self._tracks.insert(to, track)
+
+    def shuffle(self):
+        tracks = list(self._tracks)
+        random.shuffle(tracks)
+        self._tracks = deque(tracks)
+
+    def clear(self):
+        self._tracks.clear()
+        self.duration = 0
+
+    def page(self, start: int, stop: int) -> List[Track]:
+        """Returns the tracks from `start` to `stop` without copying the rest of the queue."""
+        return list(itertools.islice(self._tracks, start, stop))
 
 
 class MusicPlayer:
@@ -13,7 +78,7 @@ class MusicPlayer:
     When the bot disconnects from the Voice it's instance will be destroyed.
     """
 
-    __slots__ = ('bot', '_ctx', '_guild', '_channel', '_cog', 'queue', 'next', 'current', 'np', 'volume', 'loop', 'loop_queue', '_skip', '_clear', 'voted', '_passed_songs')
+    __slots__ = ('bot', '_ctx', '_guild', '_channel', '_cog', 'queue', 'next', 'current', 'np', 'volume', 'loop', 'loop_queue', '_skip', '_clear', 'voted', '_passed_songs', '_prefetch')
 
     def __init__(self, ctx, cog):
         self._ctx = ctx
@@ -22,7 +87,7 @@ class MusicPlayer:
         self._channel = self.bot.get_channel(ctx.channel_id)
         self._cog = ctx.cog or cog
 
-        self.queue = asyncio.Queue()
+        self.queue = TrackQueue()
         self.next = asyncio.Event()
 
         self.np = None  # Now playing message
@@ -34,6 +99,7 @@ class MusicPlayer:
         self._clear = False
         self.voted = []
         self._passed_songs = 0
+        self._prefetch = None  # (queued song, task resolving its stream)
 
         ctx.bot.loop.create_task(self.player_loop())
 
@@ -54,8 +120,7 @@ class MusicPlayer:
                     except asyncio.TimeoutError:
                         return self.destroy(self._guild)
                 else:
-                    source = self.current
-                    source = await YTDLSource.create_source(self._ctx, source.author, source.web_url, loop=self.bot.loop)
+                    source = self.current.track()
 
                 self._skip = False
                 self._clear = False
@@ -64,20 +129,21 @@ class MusicPlayer:
                     # Source was probably a stream (not downloaded)
                     # So we should regather to prevent stream expiration
                     try:
-                        source = await YTDLSource.regather_stream(source, loop=self.bot.loop)
+                        source = await YTDLSource.regather_stream(source, loop=self.bot.loop, volume=self.volume,
+                                                                  cache=self._cog.cache)
                     except Exception as e:
                         await self._channel.send(f'There was an error processing your song.\n'
                                                 f'```css\n[{e}]\n```')
                         self._skip = True
                         continue
 
-                source.volume = self.volume
                 self.current = source
 
                 try:
                     self._guild.voice_client.play(source, after=lambda _: self.bot.loop.call_soon_threadsafe(self.next.set))
                 except AttributeError:
                     return self.destroy(self._guild)
+                self.prefetch()
                 try:
                     self.np = await self._channel.send(embed=self.current.create_embed())
                 except discord.HTTPException:
@@ -103,8 +169,8 @@ class MusicPlayer:
                         self.current = None
 
                     if self.loop_queue:
-                        source = await YTDLSource.create_source(self._ctx, source.requester, source.web_url, loop=self.bot.loop)
-                        self.queue.put_nowait(source)    
+                        self.queue.put(source.track())
+                        self.prefetch()
                 else:
                     self.current = None
 
@@ -117,6 +183,23 @@ class MusicPlayer:
             pass
         self.destroy(self._guild)
 
+    def prefetch(self):
+        """Starts resolving the stream of the song at the head of the queue while the current one plays.
+        A prefetch for a song that is no longer next is cancelled, so call this whenever the queue changes."""
+        head = self.queue[0] if not self.queue.empty() else None
+        if self._prefetch is not None:
+            song, task = self._prefetch
+            if song is head:
+                return
+            task.cancel()
+            self._prefetch = None
+        if head is not None and not isinstance(head, YTDLSource):
+            if self._cog.cache is not None and head.webpage_url in self._cog.cache:
+                return  # plays from disk without a lookup
+            task = self.bot.loop.create_task(extractor.extract(head.webpage_url, guild_id=self._guild.id))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._prefetch = (head, task)
+
     def destroy(self, guild):
         """Disconnect and cleanup the player."""
         return self.bot.loop.create_task(self._cog.cleanup(guild))
@@ -0,0 +1,115 @@
+import asyncio
+import heapq
+import itertools
+from time import time
+
+
+class DeadlineScheduler:
+    """
+    Calls `callback(key)` once each scheduled key reaches its deadline.
+
+    Deadlines are kept in a heap and the worker sleeps until the earliest one,
+    so nothing is polled. Each due callback runs in its own task, so a slow
+    job never delays the others. Rescheduling or cancelling a key leaves its old heap
+    entry behind, which is skipped once it reaches the top.
+    If `retry` is set, a key whose callback raises is scheduled again that many seconds later.
+    """
+
+    def __init__(self, bot, callback, *, retry=None):
+        self.bot = bot
+        self.callback = callback
+        self.retry = retry
+        self._heap = []  # (deadline, tiebreaker, key)
+        self._deadlines = {}  # {key: deadline}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._jobs = set()  # running callbacks
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def schedule(self, key, when):
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, next(self._counter), key))
+        self._wakeup.set()
+
+    def cancel(self, key):
+        if self._deadlines.pop(key, None) is not None:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        for job in self._jobs:
+            job.cancel()
+
+    def _next_deadline(self):
+        while self._heap:
+            when, _, key = self._heap[0]
+            if self._deadlines.get(key) == when:
+                return when
+            heapq.heappop(self._heap)
+        return None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            when = self._next_deadline()
+            if when is None:
+                await self._wakeup.wait()
+                continue
+            delay = when - time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            job = self.bot.loop.create_task(self._fire(key))
+            self._jobs.add(job)
+            job.add_done_callback(self._jobs.discard)
+
+    async def _fire(self, key):
+        try:
+            await self.callback(key)
+        except Exception as e:
+            self.bot.logger.error(f'Scheduled job {key!r} failed: {e}')
+            if self.retry is not None and key not in self._deadlines:
+                self.schedule(key, time() + self.retry)
+
+
+class JobScheduler(DeadlineScheduler):
+    """
+    A DeadlineScheduler for typed jobs.
+
+    Keys are tuples of `(job_type, *args)`, and each job type has a handler
+    registered by whatever owns that data. A handler is called as
+    `handler(*args)` when its job is due. Jobs with no registered handler are
+    dropped.
+    """
+
+    def __init__(self, bot, *, retry=None):
+        super().__init__(bot, self._dispatch, retry=retry)
+        self.handlers = {}
+
+    def register(self, job_type, handler):
+        self.handlers[job_type] = handler
+
+    def unregister(self, job_type):
+        self.handlers.pop(job_type, None)
+
+    async def _dispatch(self, key):
+        job_type, *args = key
+        handler = self.handlers.get(job_type)
+        if handler is not None:
+            await handler(*args)
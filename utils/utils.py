@@ -1,3 +1,4 @@
+import bisect
 import time
 from typing import Union
 import aiohttp
@@ -13,6 +14,9 @@ TIME_DURATION_UNITS = (
     ('second', 1)
 )
 
+# total XP needed to reach each level, indexed by level
+LEVEL_THRESHOLDS = [5 / 6 * lvl * (2 * lvl * lvl + 27 * lvl + 91) for lvl in range(1000)]
+
 class Utils:
     @staticmethod
     def get_percent(x, y):
@@ -132,33 +136,34 @@ class Utils:
                     return None
 
     @staticmethod
-    async def postTicketTranscript(data):
+    async def postTicketTranscript(transcript):
+        """
+        Posts a finished `TranscriptWriter` as the form-encoded `data` field the transcript endpoint expects.
+        """
         url = f"url"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {os.getenv('SWOFTY')}"
         }
-        data = {'data': data}
+        transcript.fp.seek(0)
+        data = {'data': transcript.fp.read().decode('utf-8')}
         async with aiohttp.ClientSession() as session:
             async with session.post(url, data=data, headers=headers) as resp:
                 return await resp.read()
 
     @staticmethod
     def level(xp):
-        level = 0
-        beforexp = 0
-        nxt_lvl_xp = 0
-        for lvl in range(1, 1000):
-            lvl_xp = 5 / 6 * lvl * (2 * lvl * lvl + 27 * lvl + 91)
-            xp_needed = lvl_xp - xp
-            level = lvl-1
-            if xp_needed >= 0:
-                lvl_xp = 5 / 6 * lvl * (2 * lvl * lvl + 27 * lvl + 91)
-                exp = 5 / 6 * (lvl-1) * (2 * (lvl-1) * (lvl-1) + 27 * (lvl-1) + 91)
-                beforexp = exp+1
-                nxt_lvl_xp = lvl_xp+1
-                break
-        return level, int(beforexp), int(nxt_lvl_xp) # level, xp to next level, xp needed for next level
+        lvl = bisect.bisect_left(LEVEL_THRESHOLDS, xp, 1)
+        if lvl == len(LEVEL_THRESHOLDS):
+            return lvl - 2, 0, 0
+        return lvl - 1, int(LEVEL_THRESHOLDS[lvl - 1] + 1), int(LEVEL_THRESHOLDS[lvl] + 1) # level, xp to next level, xp needed for next level
+
+    @staticmethod
+    def levels(xps):
+        """
+        `Utils.level` for every XP value in `xps`, e.g. a leaderboard page.
+        """
+        return [Utils.level(xp) for xp in xps]
 
 
 class ExpiringCache:
@@ -0,0 +1,152 @@
+import itertools
+import os
+import re
+import unicodedata
+from time import time
+from typing import Dict, Optional
+
+# Latin lookalikes from other scripts that NFKD leaves alone.
+CONFUSABLES = {
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o', 'р': 'p',
+    'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'і': 'i', 'ї': 'i', 'ј': 'j', 'ѕ': 's', 'ԁ': 'd',
+    'ԛ': 'q', 'ԝ': 'w', 'ɡ': 'g', 'һ': 'h',
+    # Greek
+    'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p',
+    'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+    # Armenian
+    'օ': 'o', 'ս': 'u', 'ց': 'g', 'հ': 'h',
+    # Latin letters without a decomposition
+    'ƒ': 'f', 'ɑ': 'a', 'ø': 'o', 'ł': 'l', 'đ': 'd', 'ħ': 'h', 'ı': 'i', 'ß': 'ss', 'æ': 'ae', 'œ': 'oe',
+}
+
+def fold_char(char: str, replace: Dict[str, str]) -> Optional[str]:
+    """
+    Folds one character to the lowercase ASCII-ish text it stands for.
+    Returns '' for characters that should vanish (combining marks, zero-width
+    and other format characters), and None for separators.
+    """
+    if char in replace:
+        return replace[char]
+    if unicodedata.category(char) in ('Mn', 'Me', 'Cf'):
+        return ''
+    folded = ''
+    for part in unicodedata.normalize('NFKD', char.lower()):
+        if part in replace:
+            folded += replace[part]
+        elif part.isalnum():
+            folded += part
+    return folded or None
+
+
+class _FoldTable(dict):
+    """
+    A `str.translate` table built from `fold_char`, mapping separators to `sep`
+    (None deletes them). Each code point is computed the first time it is seen
+    and cached, so translating a message stays a single O(n) pass.
+    """
+
+    def __init__(self, replace: Dict[str, str], sep: Optional[str]):
+        super().__init__()
+        self.replace = replace
+        self.sep = sep
+        self[ord(' ')] = ' '
+
+    def __missing__(self, code):
+        value = fold_char(chr(code), self.replace)
+        if value is None:
+            value = self.sep
+        self[code] = value
+        return value
+
+
+class WordFilter:
+    """
+    Matches messages against word lists with a single regex.
+
+    `lists` maps a list name to its file and is ordered by priority, so
+    `match` returns the first list that has any hit. Each message is folded
+    twice, once with punctuation turned into spaces and once with it removed.
+    Both results are searched in one regex pass. Folding handles case,
+    compatibility forms, accents, zero-width characters, `CONFUSABLES` and
+    `replace`. Repeated letters are matched by the pattern itself, so
+    "fuuuck" hits "fuck" without "as" hitting "ass". The files are
+    recompiled when their modification time changes.
+    """
+
+    reload_interval = 30
+
+    def __init__(self, lists: Dict[str, str], *, replace: Dict[str, str] = None):
+        self.lists = lists
+        self._priority = {name: i for i, name in enumerate(lists)}
+        self.replace = {**CONFUSABLES, **(replace or {})}
+        self._spaced = _FoldTable(self.replace, ' ')
+        self._joined = _FoldTable(self.replace, None)
+        self._mtimes = {}
+        self._checked = 0
+        self.pattern = None
+        self.compile()
+
+    def normalize(self, text: str):
+        return f"{text.translate(self._spaced)}\n{text.translate(self._joined)}"
+
+    @staticmethod
+    def _pattern(words):
+        """
+        Builds a prefix-factored alternation of `words`, where each run of a
+        letter matches that many or more repeats of it.
+        """
+        trie = {}
+        for word in words:
+            node = trie
+            for char, run in itertools.groupby(word):
+                node = node.setdefault((char, len(list(run))), {})
+            node[None] = None
+
+        def render(node):
+            branches = [re.escape(char) + ('+' if count == 1 else f'{{{count},}}') + render(child)
+                        for (char, count), child in ((k, v) for k, v in node.items() if k is not None)]
+            if not branches:
+                return ''
+            if len(branches) == 1 and None not in node:
+                return branches[0]
+            return '(?:' + '|'.join(branches) + ')' + ('?' if None in node else '')
+
+        return render(trie)
+
+    def compile(self):
+        groups = []
+        for name, path in self.lists.items():
+            self._mtimes[path] = os.stat(path).st_mtime
+            with open(path, 'r') as f:
+                words = {' '.join(w.translate(self._spaced).split()) for w in f.read().splitlines()}
+            words.discard('')
+            if words:
+                groups.append(f"(?P<{name}>{self._pattern(words)})")
+        self.pattern = re.compile(r"(?<!\S)(?:" + '|'.join(groups) + r")(?!\S)") if groups else None
+        self._checked = time()
+
+    def reload(self):
+        """
+        Recompiles if any word list changed on disk.
+        """
+        self._checked = time()
+        try:
+            if any(os.stat(path).st_mtime != mtime for path, mtime in self._mtimes.items()):
+                self.compile()
+        except OSError:
+            pass
+
+    def match(self, text: str) -> Optional[str]:
+        if time() - self._checked > self.reload_interval:
+            self.reload()
+        if self.pattern is None:
+            return None
+        best = None
+        for found in self.pattern.finditer(self.normalize(text)):
+            name = found.lastgroup
+            if best is None or self._priority[name] < self._priority[best]:
+                best = name
+                if self._priority[best] == 0:
+                    break
+        return best
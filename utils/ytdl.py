@@ -1,9 +1,15 @@
 import asyncio
 import discord
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from discord.ext import commands
 from functools import partial
+from time import time
+from urllib.parse import parse_qs, urlparse
 import youtube_dl
 from youtube_dl import YoutubeDL
+from utils.audiocache import AudioCache
 from utils.dpy import Embed
 
 youtube_dl.utils.bug_reports_message = lambda: ''
@@ -29,9 +35,145 @@ FFMPEG_OPTIONS = {
     'options': '-vn',
 }
 
+CACHED_FFMPEG_OPTIONS = {
+    'before_options': '-nostats -loglevel 0',
+    'options': '-vn',
+}
+
 ytdl = YoutubeDL(YTDL_OPTIONS)
 
 
+class Extractor:
+    """
+    Runs `ytdl.extract_info` on its own pool of `workers` threads.
+
+    Waiting lookups are queued per guild, and free workers take one from each
+    guild in turn, so a guild queueing a playlist can't starve the others.
+    Results are cached by `(query, download)` for `ttl` seconds, or until
+    `margin` seconds before the stream URL's own `expire` parameter, whichever
+    comes first. Lookups for a key that is already being extracted share
+    the same future instead of starting another one.
+    """
+
+    workers = 4
+    listing_workers = 2
+    ttl = 3 * 60 * 60
+    margin = 5 * 60
+    max_cached = 256
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ytdl')
+        self._listing = ThreadPoolExecutor(max_workers=self.listing_workers, thread_name_prefix='ytdl-list')
+        self._cache = OrderedDict()  # {key: (expires, data)}
+        self._inflight = {}  # {key: Future}
+        self._waiting = OrderedDict()  # {guild_id: deque of (key, Future)}
+        self._running = 0
+
+    async def extract(self, query: str, *, guild_id: int = None, download: bool = False):
+        key = (query, download)
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > time():
+                self._cache.move_to_end(key)
+                return cached[1]
+            del self._cache[key]
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.get_event_loop().create_future()
+            self._waiting.setdefault(guild_id, deque()).append((key, future))
+            self._dispatch()
+        return await asyncio.shield(future)
+
+    async def stream(self, query: str, *, guild_id: int = None):
+        """
+        Yields the resolved info dict if `query` is a single video or a search.
+        If it is a playlist, yields the playlist's entries unresolved as
+        youtube-dl pages through them, so the first ones can be queued before
+        the rest have been listed. Closing the generator stops the paging.
+        Listing can hold a thread for a long time, so it runs on its own
+        `listing_workers` threads and never takes workers from `extract`.
+        """
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue()
+        stopped = threading.Event()
+
+        def put(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def run():
+            try:
+                info = ytdl.extract_info(query, download=False, process=False)
+                if info.get('_type') in ('playlist', 'multi_video'):
+                    for entry in info['entries']:
+                        if stopped.is_set():
+                            break
+                        if entry:
+                            put(entry)
+                else:
+                    info = ytdl.process_ie_result(info, download=False)
+                    put(info['entries'][0] if 'entries' in info else info)
+            except Exception as e:
+                put(e)
+            finally:
+                put(None)
+
+        loop.run_in_executor(self._listing, run)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                if item.get('_type') != 'url':
+                    self._store((item['webpage_url'], False), item)
+                yield item
+        finally:
+            stopped.set()
+
+    def _dispatch(self):
+        loop = asyncio.get_event_loop()
+        while self._running < self.workers and self._waiting:
+            guild_id, jobs = self._waiting.popitem(last=False)
+            key, future = jobs.popleft()
+            if jobs:
+                self._waiting[guild_id] = jobs
+            self._running += 1
+            query, download = key
+            job = loop.run_in_executor(self._executor, partial(ytdl.extract_info, url=query, download=download))
+            job.add_done_callback(partial(self._finish, key, future))
+
+    def _finish(self, key, future, job):
+        self._running -= 1
+        del self._inflight[key]
+        if job.cancelled():
+            future.cancel()
+        elif job.exception() is not None:
+            future.set_exception(job.exception())
+        else:
+            data = job.result()
+            self._store(key, data)
+            future.set_result(data)
+        self._dispatch()
+
+    def _store(self, key, data):
+        expires = time() + self.ttl
+        stream = data.get('url')
+        if stream:
+            try:
+                expires = min(expires, int(parse_qs(urlparse(stream).query)['expire'][0]) - self.margin)
+            except (KeyError, ValueError):
+                pass
+        if expires <= time():
+            return
+        self._cache[key] = (expires, data)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+
+extractor = Extractor()
+
+
 class VoiceConnectionError(commands.CommandError):
     """Custom Exception class for connection errors."""
 
@@ -40,10 +182,22 @@ class InvalidVoiceChannel(VoiceConnectionError):
     """Exception for cases of invalid Voice Channels."""
 
 
-class YTDLSource(discord.PCMVolumeTransformer):
+class Track:
+    """A queued song. Its stream is only gathered once it is about to play."""
+
+    __slots__ = ('webpage_url', 'requester', 'title', 'duration')
+
+    def __init__(self, webpage_url: str, requester, title: str, duration: int = None):
+        self.webpage_url = webpage_url
+        self.requester = requester
+        self.title = title
+        self.duration = duration
+
+
+class YTDLSource(discord.AudioSource):
 
     def __init__(self, source, *, data, requester):
-        super().__init__(source)
+        self.original = source
         self.requester = requester
         self.data = data
 
@@ -65,11 +219,34 @@ class YTDLSource(discord.PCMVolumeTransformer):
         # YTDL info dicts (data) have other useful information you might want
         # https://github.com/rg3/youtube-dl/blob/master/README.md
 
+    def read(self):
+        return self.original.read()
+
+    def is_opus(self):
+        return self.original.is_opus()
+
+    def cleanup(self):
+        self.original.cleanup()
+
+    @staticmethod
+    def opus_audio(source: str, *, volume: float = 1, copy: bool = False, before_options: str, options: str):
+        """Opens `source` with FFmpeg encoding straight to Opus, so discord.py doesn't encode or scale PCM frames.
+        Opus input is passed through untouched when `copy` is set and the volume is unchanged."""
+        if volume != 1:
+            options += f' -filter:a volume={volume}'
+            copy = False
+        return discord.FFmpegOpusAudio(source, codec='copy' if copy else None,
+                                       before_options=before_options, options=options)
+
     def __getitem__(self, item: str):
         """Allows us to access attributes similar to a dict.
         This is only useful when you are NOT downloading.
         """
         return self.__getattribute__(item)
+
+    def track(self):
+        """Returns a track that plays this song again."""
+        return Track(self.web_url, self.requester, self.title, self.data.get('duration'))
         
     @staticmethod
     def parse_duration(duration: int):
@@ -90,43 +267,35 @@ class YTDLSource(discord.PCMVolumeTransformer):
         return ', '.join(duration)
 
     @classmethod
-    async def create_source(cls, ctx, requester, search: str, *, loop, download=False):
-        loop = loop or asyncio.get_event_loop()
-
-        to_run = partial(ytdl.extract_info, url=search, download=download)
-        data = await loop.run_in_executor(None, to_run)
-        
-        if 'entries' in data and len(data['entries']) > 1:
-            _ret = []
-            # sort through playlist
-            for vid in data['entries']:
-                if download:
-                    source = ytdl.prepare_filename(vid)
-                    _ret.append(cls(discord.FFmpegPCMAudio(source, **FFMPEG_OPTIONS), data=data, requester=requester))
-                else:
-                    _ret.append({'webpage_url': vid['webpage_url'], 'requester': requester, 'title': vid['title']})
-            return _ret
-        else:
-            if 'entries' in data:
-                data = data['entries'][0]
-            if download:
-                source = ytdl.prepare_filename(data)
-            else:
-                return {'webpage_url': data['webpage_url'], 'requester': requester, 'title': data['title']}
-
-            return cls(discord.FFmpegPCMAudio(source, **FFMPEG_OPTIONS), data=data, requester=requester)
+    async def search(cls, ctx, requester, search: str):
+        """Yields a track for each song `search` resolves to, as soon as it is known.
+        Playlist entries are listed without resolving each video; their streams are gathered when they play."""
+        async for data in extractor.stream(search, guild_id=ctx.guild.id):
+            url = data.get('webpage_url') or data['url']
+            if not url.startswith(('http://', 'https://')):
+                # YouTube playlists list bare video IDs
+                url = f'https://www.youtube.com/watch?v={url}'
+            yield Track(url, requester, data.get('title') or url, data.get('duration'))
 
     @classmethod
-    async def regather_stream(cls, data, *, loop):
+    async def regather_stream(cls, track: Track, *, loop, volume: float = 1, cache: AudioCache = None):
         """Used for preparing a stream, instead of downloading.
-        Since Youtube Streaming links expire."""
-        loop = loop or asyncio.get_event_loop()
-        requester = data['requester']
+        Since Youtube Streaming links expire.
+        Tracks in `cache` play from disk without being extracted again."""
+        requester = track.requester
+
+        cached = cache.get(track.webpage_url) if cache is not None else None
+        if cached is not None:
+            path, data = cached
+            source = cls.opus_audio(path, volume=volume, copy=True, **CACHED_FFMPEG_OPTIONS)
+            return cls(source, data=data, requester=requester)
 
-        to_run = partial(ytdl.extract_info, url=data['webpage_url'], download=False)
-        data = await loop.run_in_executor(None, to_run)
+        data = await extractor.extract(track.webpage_url, guild_id=requester.guild.id)
+        if cache is not None:
+            cache.played(data)
 
-        return cls(discord.FFmpegPCMAudio(data['url'], **FFMPEG_OPTIONS), data=data, requester=requester)
+        source = cls.opus_audio(data['url'], volume=volume, copy=data.get('acodec') == 'opus', **FFMPEG_OPTIONS)
+        return cls(source, data=data, requester=requester)
 
     def create_embed(self):
         embed = Embed(title='Now playing',